@@ -11,7 +11,7 @@ def read_ts_csv(filename, date_format=None, df=None, colprefix=None, allow_nonnu
     Args:
         filename (_type_): _description_
         date_format (str, optional): defaults to "%d/%m/%Y" as per Fors. Other common formats include "%Y-%m-%d", "%Y/%m/%d".
-        df (pd.DataFrame, optional): If provided, the reader will append columns to this dataframe. Defaults to None.
+        df (pd.DataFrame, optional): If provided, the reader will append columns to this dataframe. To combine many files, TimeseriesJoinBuilder avoids re-joining on every file. Defaults to None.
         colprefix (str, optional): If provided, the reader will append this prefix to the start of each column name. Defaults to None.
         allow_nonnumeric (bool, optional): If false, the method will assert that all columns are numerical. Defaults to False.
         assert_date (bool, optional): If true, the method will assert that date index meets "%Y-%m-%d" format. Defaults to True.         
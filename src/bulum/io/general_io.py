@@ -1,10 +1,24 @@
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Optional, Union
+import numpy as np
 import pandas as pd
 import bulum.io as bio
 from bulum import utils
-import re
 
 
-def read(filename: str, **kwargs) -> utils.TimeseriesDataframe:
+def read(filename: str, datetime_index=False, **kwargs) -> utils.TimeseriesDataframe:
+    """Reads a file into a TimeseriesDataframe, choosing the reader based on the
+    file extension.
+
+    Args:
+        filename (str): Name of the file. Supported extensions are .res.csv, .csv, .idx and .##d.
+        datetime_index (bool, optional): If True, the TimeseriesDataframe is
+          returned in datetime index mode (see TimeseriesDataframe.to_datetime_index).
+          Defaults to False.
+        **kwargs: Passed to the reader.
+    """
     filename_lower = filename.lower()
     df = None
     if filename_lower.endswith(".res.csv"):
@@ -21,4 +35,184 @@ def read(filename: str, **kwargs) -> utils.TimeseriesDataframe:
         raise ValueError(f"Unknown file extension: {filename}")
     assert isinstance(df, utils.TimeseriesDataframe), \
         "Output of `read` is not a TimeseriesDataframe."
+    if datetime_index:
+        df.to_datetime_index()
     return df
+
+
+class TimeseriesJoinBuilder:
+    """
+    Builds one wide TimeseriesDataframe from the columns of many dataframes or
+    files. Equivalent to outer joining each dataframe onto the last (as the
+    `df=` argument of the readers does), but the frames are collected first
+    and aligned once against the union of their date indexes, so the final
+    frame is allocated once rather than copied on every join.
+
+    Example:
+        builder = TimeseriesJoinBuilder()
+        for filename in filenames:
+            builder.read(filename)
+        df = builder.build()
+    """
+
+    def __init__(self) -> None:
+        self._frames: list[pd.DataFrame] = []
+
+    def __len__(self):
+        return len(self._frames)
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Adds the columns of a date indexed dataframe."""
+        self._frames.append(df)
+
+    def read(self, filename: str, reader: Optional[Callable[..., pd.DataFrame]] = None, **kwargs) -> None:
+        """Reads a file and adds its columns.
+
+        Args:
+            filename (str): Name of the file.
+            reader (Callable, optional): Reader to use, e.g. bulum.io.read_iqqm_lqn_output.
+              Defaults to `read`, which chooses the reader based on the file extension.
+            **kwargs: Passed to the reader.
+        """
+        if reader is None:
+            reader = read
+        self.add(reader(filename, **kwargs))
+
+    def build(self) -> utils.TimeseriesDataframe:
+        """Returns the outer join of all the added dataframes, sorted by date.
+        Numeric columns are returned as float64.
+
+        Raises:
+            ValueError: If column names are not unique across the dataframes, or
+              a dataframe has duplicate dates.
+        """
+        if len(self._frames) == 0:
+            return utils.TimeseriesDataframe()
+        columns = pd.Index([c for df in self._frames for c in df.columns])
+        if columns.has_duplicates:
+            raise ValueError(f"Column names are not unique: {columns[columns.duplicated()].unique().to_list()}")
+        for df in self._frames:
+            if df.index.has_duplicates:
+                raise ValueError(f"Dates are not unique in the dataframe with columns {df.columns.to_list()}: "
+                                 f"{df.index[df.index.duplicated()].unique().to_list()}")
+
+        # Union of the date indexes, computed once
+        indexes = [df.index for df in self._frames]
+        first = indexes[0]
+        if all(first.equals(index) for index in indexes[1:]):
+            dates = first if first.is_monotonic_increasing else first.sort_values()
+        else:
+            dates = pd.Index(pd.unique(np.concatenate([index.to_numpy() for index in indexes]))).sort_values()
+        dates = dates.rename("Date")
+
+        if not all(np.issubdtype(dtype, np.number) for df in self._frames for dtype in df.dtypes):
+            # Non-numeric data; align each frame and concatenate
+            df = pd.concat([df.reindex(dates) for df in self._frames], axis=1)
+            return utils.TimeseriesDataframe.from_dataframe(df)
+
+        # Fill a single (column x date) allocation, frame by frame
+        values = np.empty((len(columns), len(dates)), dtype=np.float64)
+        col = 0
+        for df in self._frames:
+            block = values[col:col + df.shape[1]]
+            col += df.shape[1]
+            if df.index.equals(dates):
+                block[:] = df.to_numpy(dtype=np.float64).T
+                continue
+            block[:] = np.nan
+            # Frames usually cover a contiguous run of dates; avoid a per-date lookup
+            start = dates.searchsorted(df.index[0]) if len(df) > 0 else 0
+            if df.index.is_monotonic_increasing and dates[start:start + len(df)].equals(df.index):
+                block[:, start:start + len(df)] = df.to_numpy(dtype=np.float64).T
+            else:
+                block[:, dates.get_indexer(df.index)] = df.to_numpy(dtype=np.float64).T
+        df = pd.DataFrame(values.T, index=dates, columns=columns, copy=False)
+        return utils.TimeseriesDataframe.from_dataframe(df)
+
+
+def read_many(paths: Iterable[str], *, wide=False, keys: Optional[Iterable] = None,
+              max_workers: Optional[int] = None, datetime_index=False,
+              progress: Optional[Callable[[int, int, str], None]] = None,
+              errors: Optional[dict] = None,
+              **kwargs) -> Union[utils.DataframeEnsemble, utils.TimeseriesDataframe]:
+    """Reads many files concurrently using `read`, choosing the reader for each
+    file based on its extension.
+
+    Files are read in a thread pool with at most 2 x max_workers reads in
+    flight, so memory is bounded by the files being read plus the result.
+    A file that fails to read is reported in `errors` and skipped, without
+    aborting the batch.
+
+    Args:
+        paths (Iterable[str]): Names of the files.
+        wide (bool, optional): If True, returns a single TimeseriesDataframe
+          of all the columns, outer joined on the date index by a
+          TimeseriesJoinBuilder. Otherwise returns
+          a DataframeEnsemble with a member per file. Defaults to False.
+        keys (Iterable, optional): Ensemble keys, one per path. Defaults to the paths.
+        max_workers (int, optional): Number of threads. Defaults to the number of CPUs.
+        datetime_index (bool, optional): See `read`. Defaults to False.
+        progress (Callable[[int, int, str], None], optional): Called as
+          progress(files_done, files_total, path) as each file completes.
+          Defaults to None.
+        errors (dict, optional): If provided, the exception raised for each file
+          that could not be read (or added to the ensemble) is stored in this
+          dict, keyed by path. Otherwise a warning is printed for each such file.
+          Defaults to None.
+        **kwargs: Passed to `read`.
+    """
+    paths = list(paths)
+    keys = paths if keys is None else list(keys)
+    if len(keys) != len(paths):
+        raise ValueError(f"Got {len(keys)} keys for {len(paths)} paths.")
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    def report_error(path, e):
+        if errors is not None:
+            errors[path] = e
+        else:
+            print(f"Warning: Could not read {path}: {e}")
+
+    def read_one(path):
+        df = read(path, datetime_index=datetime_index, **kwargs)
+        df.source = path
+        return df
+
+    results = [None] * len(paths)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        next_i = 0
+        while next_i < len(paths) or pending:
+            # Keep a bounded number of reads in flight
+            while next_i < len(paths) and len(pending) < 2 * max_workers:
+                pending[executor.submit(read_one, paths[next_i])] = next_i
+                next_i += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = pending.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    report_error(paths[i], e)
+                done += 1
+                if progress is not None:
+                    progress(done, len(paths), paths[i])
+
+    # Combine in the order of the paths
+    if wide:
+        builder = TimeseriesJoinBuilder()
+        for df in results:
+            if df is not None:
+                builder.add(df)
+        return builder.build()
+    ensemble = utils.DataframeEnsemble()
+    for path, key, df in zip(paths, keys, results):
+        if df is None:
+            continue
+        try:
+            ensemble.add_dataframe(df, key=key)
+        except ValueError as e:
+            report_error(path, e)
+    return ensemble
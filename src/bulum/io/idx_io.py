@@ -39,7 +39,7 @@ def write_area_ts_csv(df, filename, units = "(mm.d^-1)"):
         Exception: If shortenned field names are going to clash in output file.
     """
     # ensures dataframe adheres to standards
-    utils.assert_df_format_standards(df)
+    utils.assert_df_format_standards(df, allow_datetime_index=True)
     # convert field names to 12 chars and check for collisions
     fields = {}
     for c in df.columns:
@@ -59,6 +59,6 @@ def write_area_ts_csv(df, filename, units = "(mm.d^-1)"):
     # open a file and write the header and the csv body
     with open(filename, "w+", newline='', encoding='utf-8') as file:        
         file.write(header)
-        df.to_csv(file, header=False, na_rep=' NaN')
+        df.to_csv(file, header=False, na_rep=' NaN', date_format=r"%Y-%m-%d")
         
         
\ No newline at end of file
@@ -1,4 +1,6 @@
 import os
+import re
+from datetime import datetime
 import pandas as pd
 import numpy as np
 from bulum import utils
@@ -20,28 +22,23 @@ def _detect_header_bytes(b_data: np.ndarray) -> bool:
     return first_non_zero and rest_zeroes
 
 
-def read_idx(filename, skip_header_bytes=None) -> utils.TimeseriesDataframe:
-    """_summary_
+def _read_idx_header(filename) -> tuple[str, str, int, list[str]]:
+    """
+    Helper function for read_idx and read_idx_lazy. Parses the ".idx" file and
+    returns the start date, end date, date flag and column names.
 
     Args:
-        filename (_type_): Name of the IDX file.
-        skip_header_bytes (bool | None): Whether to skip header bytes in the IDX
-          file (related to the compiler used for IQQM). If set to None, attempt
-          to detect the presence of header bytes automatically.
-
-    Returns:
-        utils.TimeseriesDataframe: _description_
+        filename (str): Name of the IDX file.
     """
     if not os.path.exists(filename):
         raise FileNotFoundError(f"File does not exist: {filename}")
-    # Read ".idx" file
     with open(filename, 'r') as f:
         # Skip line
         stmp = f.readline()
         # Start date, end date, date interval
         stmp = f.readline().split()
         date_start = utils.standardize_datestring_format([stmp[0]])[0]
-        date_end = utils.standardize_datestring_format([stmp[1]])[0]        
+        date_end = utils.standardize_datestring_format([stmp[1]])[0]
         date_flag = int(stmp[2])
         snames = []
         for n, line in enumerate(f):
@@ -49,40 +46,265 @@ def read_idx(filename, skip_header_bytes=None) -> utils.TimeseriesDataframe:
             sdesc = line[13:54].strip()
             sname = f"{n + 1}>{sfile}>{sdesc}"
             snames.append(sname)
-    # Read ".out" file
+    return date_start, date_end, date_flag, snames
+
+
+def _get_out_filename(filename) -> str:
+    """Helper function returning the ".out" file corresponding to a ".idx" file."""
     out_filename = filename.lower().replace('.idx', '.out')
     if not os.path.exists(out_filename):
         raise FileNotFoundError(f"File does not exist: {out_filename}")
-    # 4-byte reals
-    b_types = [(s, 'f4') for s in snames]
-    # Read all data in, drop header bytes (first row) if necessary
-    b_data = np.fromfile(out_filename, dtype=np.dtype(b_types))
-    # Detection of header bytes
-    if skip_header_bytes is None:
-        skip_header_bytes = _detect_header_bytes(b_data)
-    if skip_header_bytes:
-        b_data = b_data[1:]  # skip header bytes
-    # Read data
+    return out_filename
+
+
+def _check_date_flag(date_flag: int) -> None:
+    """Helper function raising for date intervals not supported by the readers."""
     if date_flag == 0:
-        daily_date_values = utils.datetime_functions.get_dates(
-            date_start, end_date=date_end, include_end_date=True)         
-        df = pd.DataFrame.from_records(b_data, index=daily_date_values)
-        df.columns = snames
-        df.index.name = "Date"
-        # Check data types. If not 'float64' or 'int64', convert to 'float64'
-        x = df.select_dtypes(exclude=['int64','float64']).columns
-        if x.__len__()>0:
-            df=df.astype({i: 'float64' for i in x})
+        return
     elif date_flag == 1:
         raise NotImplementedError("Monthly data not yet supported")
     elif date_flag == 3:
         raise NotImplementedError("Annual data not yet supported")
     else:
         raise ValueError(f"Unsupported date interval: {date_flag}")
+
+
+def _resolve_idx_columns(snames: list[str], columns) -> list[int]:
+    """
+    Helper function for read_idx. Returns the (0-based) positions of the
+    requested columns. Each item in `columns` may be:
+        int         the 1-based entry number in the ".idx" file, i.e. the number
+                    before the first '>' in the column name
+        str         the full column name, the source file name, or the description
+        re.Pattern  a compiled regex, searched against the full column name
+
+    Args:
+        snames (list[str]): Column names as generated from the ".idx" file.
+        columns (any): A single column specifier or a list of them. If None, all columns are returned.
+    """
+    if columns is None:
+        return list(range(len(snames)))
+    if isinstance(columns, (str, int, re.Pattern)):
+        columns = [columns]
+    answer = []
+    for c in columns:
+        if isinstance(c, (int, np.integer)):
+            if not 1 <= c <= len(snames):
+                raise KeyError(f"Column number {c} is outside the range 1 to {len(snames)}.")
+            matches = [c - 1]
+        elif isinstance(c, re.Pattern):
+            matches = [i for i, s in enumerate(snames) if c.search(s)]
+        elif isinstance(c, str):
+            matches = [i for i, s in enumerate(snames) if c == s or c in s.split(">", 2)[1:]]
+        else:
+            raise TypeError(f"Unsupported column specifier: {c}")
+        if len(matches) == 0:
+            raise KeyError(f"No column matched {c}.")
+        answer.extend(m for m in matches if m not in answer)
+    return answer
+
+
+def _to_datetime64d(date) -> np.datetime64:
+    """Helper function converting a date string or datetime to np.datetime64[D]."""
+    if isinstance(date, str):
+        date = utils.standardize_datestring_format([date])[0]
+    elif isinstance(date, datetime):
+        date = date.strftime(r"%Y-%m-%d")
+    return np.datetime64(date, 'D')
+
+
+def _resolve_idx_rows(date_start: str, n_days: int, start=None, end=None) -> tuple[int, int]:
+    """
+    Helper function for read_idx. Returns the first row and the number of rows
+    covering the (inclusive) date range from start to end, cropped to the
+    available data.
+    """
+    first_date = np.datetime64(date_start, 'D')
+    i0 = 0 if start is None else int((_to_datetime64d(start) - first_date).astype(int))
+    i1 = n_days - 1 if end is None else int((_to_datetime64d(end) - first_date).astype(int))
+    i0 = max(i0, 0)
+    i1 = min(i1, n_days - 1)
+    if i1 < i0:
+        raise ValueError(f"No data between {start} and {end}.")
+    return i0, i1 - i0 + 1
+
+
+def read_idx(filename, skip_header_bytes=None, columns=None, start=None, end=None) -> utils.TimeseriesDataframe:
+    """Reads an IQQM IDX file and its corresponding OUT binary file.
+
+    Records in the OUT file have a fixed width of 4 bytes per column, so the
+    requested date range is read directly from its byte offset and only the
+    requested columns are converted to float64.
+
+    Args:
+        filename (_type_): Name of the IDX file.
+        skip_header_bytes (bool | None): Whether to skip header bytes in the IDX
+          file (related to the compiler used for IQQM). If set to None, attempt
+          to detect the presence of header bytes automatically.
+        columns (any, optional): Column(s) to read, by 1-based entry number,
+          column name, source file name, description, or compiled regex
+          pattern. Defaults to None, which reads all columns.
+        start (str | datetime, optional): First date to read. Defaults to the start of the file.
+        end (str | datetime, optional): Last date to read (inclusive). Defaults to the end of the file.
+
+    Returns:
+        utils.TimeseriesDataframe: Daily float64 data indexed by "Date", as
+          "%Y-%m-%d" strings covering the requested date range. Columns are
+          named "<entry number>><source file>><description>". Selected columns
+          appear once each, in the order they were specified (the matches of
+          a name or pattern in file order); all columns in file order if
+          columns is None.
+    """
+    # Read ".idx" file
+    date_start, date_end, date_flag, snames = _read_idx_header(filename)
+    # Read ".out" file
+    out_filename = _get_out_filename(filename)
+    _check_date_flag(date_flag)
+    col_positions = _resolve_idx_columns(snames, columns)
+    n_days = int((np.datetime64(date_end) - np.datetime64(date_start)).astype(int)) + 1
+    i0, n_rows = _resolve_idx_rows(date_start, n_days, start, end)
+    # 4-byte reals
+    b_dtype = np.dtype([(s, 'f4') for s in snames])
+    with open(out_filename, 'rb') as f:
+        # Detection of header bytes (first record)
+        if skip_header_bytes is None:
+            skip_header_bytes = _detect_header_bytes(np.fromfile(f, dtype=b_dtype, count=1))
+        header_records = 1 if skip_header_bytes else 0
+        # The ".out" file must hold exactly the records in the ".idx" date range,
+        # unless only a window of dates is requested (checked after reading)
+        file_size = os.fstat(f.fileno()).st_size
+        expected_size = (header_records + n_days) * b_dtype.itemsize
+        if start is None and end is None and file_size != expected_size:
+            raise ValueError(f"Expected {header_records + n_days} records ({expected_size} bytes) in {out_filename} " +
+                             f"but the file has {file_size} bytes.")
+        # Seek straight to the first requested record and read only the requested rows
+        f.seek((header_records + i0) * b_dtype.itemsize)
+        b_data = np.fromfile(f, dtype=b_dtype, count=n_rows)
+    if len(b_data) != n_rows:
+        raise ValueError(f"Expected {n_rows} records in {out_filename} but found {len(b_data)}.")
+    # Copy the requested columns into a single float64 block
+    values = np.empty((n_rows, len(col_positions)), dtype='float64')
+    for j, k in enumerate(col_positions):
+        values[:, j] = b_data[snames[k]]
+    first_date = str(np.datetime64(date_start, 'D') + i0)
+    daily_date_values = utils.datetime_functions.get_dates(
+        first_date, days=n_rows, str_format=r"%Y-%m-%d")
+    df = pd.DataFrame(values, index=daily_date_values, columns=[snames[k] for k in col_positions])
+    df.index.name = "Date"
     utils.assert_df_format_standards(df)
     return utils.TimeseriesDataframe.from_dataframe(df)
 
 
+def read_idx_lazy(filename, skip_header_bytes=None, dtype='float64') -> "LazyIdxDataframe":
+    """Opens an IDX/OUT pair as a memory-mapped, lazily materialised dataframe.
+    Nothing is read from the ".out" file until columns are selected, and then
+    only the selected columns are copied into memory.
+
+    Args:
+        filename (str): Name of the IDX file.
+        skip_header_bytes (bool | None): As per read_idx(...).
+        dtype (str, optional): Data type of materialised columns. Use 'float32'
+          to keep the native precision of the ".out" file and halve the memory
+          footprint. Defaults to 'float64' as per the bulum format standards.
+
+    Returns:
+        LazyIdxDataframe: Lazy view of the IDX/OUT data.
+    """
+    return LazyIdxDataframe(filename, skip_header_bytes=skip_header_bytes, dtype=dtype)
+
+
+class LazyIdxDataframe:
+    """
+    A read-only, memory-mapped view of an IDX/OUT pair. It behaves a little like
+    a TimeseriesDataframe (len, shape, columns, index, column selection with [])
+    but the data stay on disk in a np.memmap until columns are selected.
+
+    Selecting a single column name returns a pd.Series, while selecting a list
+    of column names returns a TimeseriesDataframe containing only those
+    columns.
+
+    >>> lazy_df = bio.read_idx_lazy("BUR_FLWX.IDX")
+    >>> df = lazy_df[["1>BUR_001.q>Burdekin at Sellheim", "7>BUR_010.q>Bowen"]]
+    """
+
+    def __init__(self, filename, skip_header_bytes=None, dtype='float64') -> None:
+        """
+        Args:
+            filename (str): Name of the IDX file.
+            skip_header_bytes (bool | None): As per read_idx(...).
+            dtype (str, optional): Data type of materialised columns. Defaults to 'float64'.
+        """
+        date_start, date_end, date_flag, snames = _read_idx_header(filename)
+        _check_date_flag(date_flag)
+        self.filename = filename
+        self.out_filename = _get_out_filename(filename)
+        self.date_start = date_start
+        self.date_end = date_end
+        self.dtype = np.dtype(dtype)
+        self.columns = pd.Index(snames)
+        b_types = [(s, 'f4') for s in snames]
+        b_data = np.memmap(self.out_filename, dtype=np.dtype(b_types), mode='r')
+        if skip_header_bytes is None:
+            skip_header_bytes = _detect_header_bytes(b_data)
+        if skip_header_bytes:
+            b_data = b_data[1:]  # skip header bytes, still a view on the file
+        self._b_data = b_data
+        self._index = None
+        n_days = (np.datetime64(date_end) - np.datetime64(date_start)).astype(int) + 1
+        if n_days != len(b_data):
+            raise ValueError(f"Expected {n_days} records in {self.out_filename} but found {len(b_data)}.")
+
+    def __len__(self):
+        return len(self._b_data)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._get_column(key)
+        return self.to_dataframe(columns=key)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (len(self), len(self.columns))
+
+    @property
+    def index(self) -> pd.Index:
+        """String date index in the "%Y-%m-%d" format. Generated on first use."""
+        if self._index is None:
+            self._index = pd.Index(utils.get_dates(self.date_start, end_date=self.date_end,
+                                                   include_end_date=True), name="Date")
+        return self._index
+
+    def _get_column(self, name: str) -> pd.Series:
+        if name not in self.columns:
+            raise KeyError(name)
+        values = np.array(self._b_data[name], dtype=self.dtype)
+        return pd.Series(values, index=self.index, name=name)
+
+    def to_dataframe(self, columns=None, start=None, end=None) -> utils.TimeseriesDataframe:
+        """Materialises the selected columns (all columns if None) over the
+        selected date range into a TimeseriesDataframe.
+
+        Args:
+            columns (any, optional): Column(s) to materialise, as per read_idx(...). Defaults to None.
+            start (str | datetime, optional): First date to materialise. Defaults to None.
+            end (str | datetime, optional): Last date to materialise (inclusive). Defaults to None.
+
+        Returns:
+            utils.TimeseriesDataframe: Dataframe of the selected columns.
+        """
+        snames = list(self.columns)
+        col_positions = _resolve_idx_columns(snames, columns)
+        i0, n_rows = _resolve_idx_rows(self.date_start, len(self), start, end)
+        b_data = self._b_data[i0:i0 + n_rows]
+        values = np.empty((n_rows, len(col_positions)), dtype=self.dtype)
+        for j, k in enumerate(col_positions):
+            values[:, j] = b_data[snames[k]]
+        df = pd.DataFrame(values, index=self.index[i0:i0 + n_rows],
+                          columns=[snames[k] for k in col_positions])
+        df.index.name = "Date"
+        return utils.TimeseriesDataframe.from_dataframe(df)
+
+
 def write_idx_native(df: pd.DataFrame, filepath, type="None", units="None") -> None:
     """Writer for .IDX and corresponding .OUT binary files written in native Python.
     Currently only supports daily data (date flag 0), as with the reader read_idx(...). 
@@ -109,9 +331,12 @@ def write_idx_native(df: pd.DataFrame, filepath, type="None", units="None") -> N
         case _:
             raise ValueError(f"Unsupported date interval: {date_flag}")
 
-    utils.assert_df_format_standards(df)
-    first_date = df.index[0]
-    last_date = df.index[-1]
+    utils.assert_df_format_standards(df, allow_datetime_index=True)
+    if isinstance(df.index, pd.DatetimeIndex):
+        first_date, last_date = utils.datetimes_to_strings(df.index[[0, -1]])
+    else:
+        first_date = df.index[0]
+        last_date = df.index[-1]
     col_names = df.columns
 
     # write index
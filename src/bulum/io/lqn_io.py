@@ -1,9 +1,52 @@
 import os
+from datetime import datetime
 import numpy as np
 import pandas as pd
 from bulum import utils
 
 
+# Listquan files have a 5 line header and a blank line before the data
+_LQN_DATA_START_ROW = 7
+
+
+def _parse_iqqm_lqn(filename, col_name) -> pd.DataFrame:
+    """
+    Helper function for the listquan readers. Parses the (date, value) records
+    of a listquan file into a Date indexed DataFrame with a single column. The
+    records are split into tokens in one pass over the bytes of the file and
+    the values converted in bulk. Files that do not have exactly one date and
+    one value per record (e.g. missing values), or whose dates are not
+    consecutive, are parsed with pd.read_csv as before.
+    """
+    with open(filename, "rb") as f:
+        for _ in range(_LQN_DATA_START_ROW - 2):
+            f.readline()
+        tokens = f.read().split()
+    try:
+        if len(tokens) == 0 or len(tokens) % 2 != 0:
+            raise ValueError("Expected a date and a value on every line.")
+        dates = tokens[0::2]
+        values = np.fromiter(map(float, tokens[1::2]), dtype=np.float64, count=len(tokens) // 2)
+        if len(dates) != len(values):
+            raise ValueError(f"Found {len(dates)} dates but {len(values)} values.")
+        # Daily records are consecutive, so only the first and last dates are parsed
+        first_date, last_date = dates[0].decode(), dates[-1].decode()
+        date_fmt = utils.get_date_format(first_date)
+        start_date = datetime.strptime(first_date, date_fmt)
+        days = (datetime.strptime(last_date, date_fmt) - start_date).days + 1
+        if days != len(values):
+            raise ValueError(f"Expected {days} dates between {first_date} and {last_date} but found {len(values)}.")
+    except (ValueError, IndexError, TypeError):
+        temp = pd.read_csv(filename, skiprows=(_LQN_DATA_START_ROW-2),
+                           sep=r'\s+', names=["Date", col_name], header=None)
+        temp.set_index(temp.columns[0], inplace=True)
+        temp.index = utils.standardize_datestring_format(temp.index)
+        temp.index.name = "Date"
+        return temp.replace(r'^\s*$', np.nan, regex=True)
+    index = pd.Index(utils.get_date_strings(start_date, days), name="Date")
+    return pd.DataFrame({col_name: values}, index=index)
+
+
 def read_iqqm_lqn_output(filename, col_name=None, df=None) -> utils.TimeseriesDataframe:
     """
     Reads the output of IQQM listquan. This is a space-separated is format with two columns (date, value) and data 
@@ -11,7 +54,7 @@ def read_iqqm_lqn_output(filename, col_name=None, df=None) -> utils.TimeseriesDa
 
     Args:
         filename (_type_): _description_
-        df (_type_, optional): _description_. Defaults to None.
+        df (_type_, optional): _description_. To combine many files, use read_iqqm_lqn_outputs or TimeseriesJoinBuilder, which avoid re-joining on every file. Defaults to None.
 
     Returns:
         pd.DataFrame: _description_
@@ -23,17 +66,37 @@ def read_iqqm_lqn_output(filename, col_name=None, df=None) -> utils.TimeseriesDa
     if col_name is None:
         col_name = os.path.basename(filename)
     # Read the data
-    data_start_row = 7
-    temp = pd.read_csv(filename, skiprows=(data_start_row-2),
-                       sep=r'\s+', names=["Date", col_name], header=None)
-    # temp = utils.set_index_dt(temp, format='%d/%m/%Y')
-    temp.set_index(temp.columns[0], inplace=True)
-    temp.index = utils.standardize_datestring_format(temp.index)
-    temp.index.name = "Date"
-    temp = temp.replace(r'^\s*$', np.nan, regex=True)
+    temp = _parse_iqqm_lqn(filename, col_name)
     df = df.join(temp, how="outer").sort_index()
     # TODO: THERE IS NO GUARANTEE THAT THE DATES OVERLAP, THEREFORE WE MAY END UP WITH A DATAFRAME WITH INCOMPLETE DATES
     # TODO: I SHOULD MAKE DEFAULT BEHAVIOUR AUTO-DETECT FORMAT DEPENDING ON *TYPE* AND *LOCATION* OF DELIMIT CHARS
     # TODO: In the meantime we use the below to assert that the format of the resulting df meets our minimum standards.
     utils.assert_df_format_standards(df)
     return utils.TimeseriesDataframe.from_dataframe(df)
+
+
+def read_iqqm_lqn_outputs(filenames, col_names=None) -> utils.TimeseriesDataframe:
+    """
+    Reads the outputs of IQQM listquan from many files, returning them as columns
+    aligned on the union of their dates. Equivalent to calling read_iqqm_lqn_output
+    on each file with df= the previous result, but the frame is built once.
+
+    Args:
+        filenames (list): Names of the listquan files.
+        col_names (list, optional): Column name for each file. Defaults to the base names of the files.
+
+    Returns:
+        pd.DataFrame: Dataframe with a column per file.
+    """
+    from .general_io import TimeseriesJoinBuilder
+    filenames = list(filenames)
+    if col_names is None:
+        col_names = [os.path.basename(filename) for filename in filenames]
+    if len(col_names) != len(filenames):
+        raise ValueError(f"Got {len(col_names)} column names for {len(filenames)} files.")
+    builder = TimeseriesJoinBuilder()
+    for filename, col_name in zip(filenames, col_names):
+        builder.add(_parse_iqqm_lqn(filename, col_name))
+    df = builder.build()
+    utils.assert_df_format_standards(df)
+    return df
@@ -1,57 +1,126 @@
 from datetime import datetime
+from io import StringIO
+import hashlib
+import json
+import os
+import threading
+import zipfile
 import numpy as np
 import pandas as pd
 from bulum import utils
 from typing import Optional
 
+# Bump when the layout of the sidecar cache files changes
+_RES_CSV_CACHE_VERSION = 1
+
+
+def _res_csv_cache_path(filename, cache_dir=None) -> str:
+    """Returns the path of the sidecar cache file for a res csv. Without a cache_dir
+    the cache sits beside the res csv, otherwise it is named after a hash of the
+    absolute path of the res csv."""
+    if cache_dir is None:
+        return f"{filename}.npz"
+    abs_path = os.path.abspath(filename)
+    digest = hashlib.sha1(abs_path.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(filename)}.{digest}.npz")
+
+
+def _res_csv_cache_key(filename, custom_na_values) -> str:
+    """Returns the key identifying the parsed contents of a res csv: its path, size and
+    modification time, and the missing values used to parse it."""
+    stat = os.stat(filename)
+    return json.dumps({"version": _RES_CSV_CACHE_VERSION,
+                       "path": os.path.abspath(filename),
+                       "size": stat.st_size,
+                       "mtime_ns": stat.st_mtime_ns,
+                       "custom_na_values": None if custom_na_values is None else [str(x) for x in custom_na_values]})
+
+
+def _load_res_csv_cache(cache_path, key):
+    """Returns (data, metadata lines) from a sidecar cache, or None if the cache does
+    not exist or is stale."""
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            if str(npz["key"]) != key:
+                return None
+            columns = npz["columns"].tolist()
+            index = pd.Index(npz["index"].tolist(), name="Date")
+            if "values" in npz.files:
+                temp = pd.DataFrame(npz["values"], index=index, columns=columns)
+            else:
+                temp = pd.DataFrame({i: npz[f"column_{i}"] for i in range(len(columns))}, index=index)
+                temp.columns = columns
+            return temp, npz["metadata_lines"].tolist()
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # Unreadable or partially written cache; re-parse the res csv
+        return None
+
+
+def _save_res_csv_cache(cache_path, key, temp: pd.DataFrame, metadata_lines) -> None:
+    """Writes the parsed data and metadata lines of a res csv to a sidecar cache.
+    Non-numeric data is not cached. Failure to write the cache is not an error."""
+    dtypes = temp.dtypes.unique()
+    if not all(np.issubdtype(dtype, np.number) for dtype in dtypes):
+        return
+    arrays = {"key": np.array(key),
+              "index": temp.index.to_numpy(dtype=str),
+              "columns": temp.columns.to_numpy(dtype=str),
+              "metadata_lines": np.array(metadata_lines, dtype=str)}
+    if len(dtypes) == 1:
+        arrays["values"] = temp.to_numpy()
+    else:
+        arrays.update({f"column_{i}": temp.iloc[:, i].to_numpy() for i in range(temp.shape[1])})
+    # Write to a temporary file first so readers never see a partial cache. The
+    # name is unique per thread, as read_many may read the same file concurrently.
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 
 def read_res_csv(filename, custom_na_values=None,
                  df=None, colprefix=None,
                  allow_nonnumeric=False, use_field_name=False,
+                 cache: bool = False, cache_dir: Optional[str] = None,
                  **kwargs) -> Optional[utils.TimeseriesDataframe]:
     """Reads a res csv data file into a DataFrame, and sets the index to the Date.
 
     Args:
         filename (_type_): _description_
         custom_na_values (_type_): A list of values to override the automatically-determined missing values. If None, the missing values will include any defined in the .res.csv file as well as ['', ' ', 'null', 'NULL', 'NAN', 'NaN', 'nan', 'NA', 'na', 'N/A' 'n/a', '#N/A', '#NA', '-NaN', '-nan'].
+        cache (bool, optional): If True, the parsed data is stored in a binary .npz sidecar file on first read, and later
+          reads load the sidecar instead of parsing the res csv. The sidecar is keyed by the path, size and modification
+          time of the res csv, and is rewritten whenever the res csv changes. Defaults to False.
+        cache_dir (str, optional): Directory for the sidecar files. If None, the sidecar is written beside the res csv
+          as "<filename>.npz". Defaults to None.
 
     Returns:
         _type_: _description_
     """
-    # Handle custom na values
-    if custom_na_values is None:
-        na_values = ['', ' ', 'null', 'NULL', 'NAN', 'NaN', 'nan',
-                     'NA', 'na', 'N/A' 'n/a', '#N/A', '#NA', '-NaN', '-nan']
-    else:
-        na_values = custom_na_values
     # If no df was supplied, instantiate a new one
     if df is None:
         df = pd.DataFrame()
-    # Scrape through the header
-    metadata_lines = []
-    eoh_found = False
-    with open(filename) as f:
-        line = ""
-        for line in f:
-            metadata_lines.append(line)
-            if line.strip().startswith("EOH"):
-                eoh_found = True
-                break
-            if custom_na_values is None and line.strip().lower().startswith("missing data value,"):
-                new_na_value = line.strip()[len("missing data value,"):]
-                # e.g. "-9999"
-                na_values.append(new_na_value)
-    if not eoh_found:
-        return None  # maybe it's not a .res.csv
-    col_header_line_number = len(metadata_lines) - 2
-    lines_to_skip = list(range(col_header_line_number)) + \
-        [col_header_line_number + 1]
-    # Read the data
-    temp = pd.read_csv(filename, na_values=na_values, skiprows=lines_to_skip)
-    # Date index
-    temp.set_index(temp.columns[0], inplace=True)
-    temp.index = utils.standardize_datestring_format(temp.index)
-    temp.index.name = "Date"
+    # Load the parsed data from the sidecar cache if it is up to date
+    parsed = None
+    if cache:
+        cache_path = _res_csv_cache_path(filename, cache_dir)
+        cache_key = _res_csv_cache_key(filename, custom_na_values)
+        parsed = _load_res_csv_cache(cache_path, cache_key)
+    if parsed is None:
+        parsed = _parse_res_csv(filename, custom_na_values)
+        if parsed is None:
+            return None  # maybe it's not a .res.csv
+        if cache:
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+            _save_res_csv_cache(cache_path, cache_key, *parsed)
+    temp, metadata_lines = parsed
     # Check values
     if not allow_nonnumeric:
         for col in temp.columns:
@@ -59,28 +128,13 @@ def read_res_csv(filename, custom_na_values=None,
                 raise Exception(f"ERROR: Column '{col}' is not numeric!")
     # Replace column names with field name if required
     if use_field_name:
-        field_count = -2                                         #i'm using this -2 value to mean do nothing
-        for line in metadata_lines:
-            line = line.strip()
-            if line == "EOC":
-                field_count = -1                                 #i'm using this -1 value to mean the field count will be defined on the next line
-            elif field_count == -1:
-                field_count = int(line.strip())                  #field count. Field properties will start on the next line
-            elif field_count > 0:                                #this means we are in the 
-                field_properties = line.split(",")               #all properties of the current field
-                field_number = int(field_properties[0])          #field number should be at index 0
-                field_name = field_properties[5]                 #field name should be at index 5
-                c = temp.columns[field_number - 1]
-                temp.rename(columns={c: field_name}, inplace=True)
-                is_last_field = (field_number >= field_count)
-                if is_last_field:
-                    field_count = -2                             # reset field count to stop processing field names
-            else:
-                field_count = -2  # reset field count to stop processing field names
+        columns = temp.columns.to_list()
+        for field_number, field_name in _res_csv_field_names(metadata_lines).items():
+            columns[field_number - 1] = field_name
+        temp.columns = columns
     # Add column prefix if required
     if colprefix is not None:
-        for c in temp.columns:
-            temp.rename(columns={c: f"{colprefix}{c}"}, inplace=True)
+        temp.columns = [f"{colprefix}{c}" for c in temp.columns]
     # Join to existing dataframe if required
     if df is None:
         df = temp
@@ -96,6 +150,68 @@ def read_res_csv(filename, custom_na_values=None,
     return utils.TimeseriesDataframe.from_dataframe(df)
 
 
+def _parse_res_csv(filename, custom_na_values=None) -> Optional[tuple[pd.DataFrame, list[str]]]:
+    """Helper function for read_res_csv. Parses a res csv into a Date indexed DataFrame,
+    returning it with the metadata lines of the header, or None if no end of header was found.
+    """
+    # Handle custom na values
+    if custom_na_values is None:
+        na_values = ['', ' ', 'null', 'NULL', 'NAN', 'NaN', 'nan',
+                     'NA', 'na', 'N/A' 'n/a', '#N/A', '#NA', '-NaN', '-nan']
+    else:
+        na_values = custom_na_values
+    # Scrape through the header, recording the byte offset where the data starts
+    metadata_lines = []
+    eoh_found = False
+    with open(filename, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode(errors="replace")
+            metadata_lines.append(line)
+            if line.strip().startswith("EOH"):
+                eoh_found = True
+                break
+            if custom_na_values is None and line.strip().lower().startswith("missing data value,"):
+                new_na_value = line.strip()[len("missing data value,"):]
+                # e.g. "-9999"
+                na_values.append(new_na_value)
+        if not eoh_found:
+            return None  # maybe it's not a .res.csv
+        data_offset = f.tell()
+        # Column names are on the line before EOH
+        columns = pd.read_csv(StringIO(metadata_lines[-2]), nrows=0).columns
+        # Read the data from the open file, positioned at the start of the data
+        f.seek(data_offset)
+        temp = pd.read_csv(f, header=None, index_col=0, na_values=na_values, engine="c")
+    temp.columns = columns[1:]
+    # Date index
+    temp.index = utils.standardize_datestring_format(temp.index)
+    temp.index.name = "Date"
+    return temp, metadata_lines
+
+
+def _res_csv_field_names(metadata_lines) -> dict[int, str]:
+    """Helper function for read_res_csv. Returns the field names defined in the metadata
+    lines of a res csv, keyed by field number.
+    """
+    field_names = {}
+    field_count = -2                                         #i'm using this -2 value to mean do nothing
+    for line in metadata_lines:
+        line = line.strip()
+        if line == "EOC":
+            field_count = -1                                 #i'm using this -1 value to mean the field count will be defined on the next line
+        elif field_count == -1:
+            field_count = int(line)                          #field count. Field properties will start on the next line
+        elif field_count > 0:                                #this means we are in the field properties
+            field_properties = line.split(",")               #all properties of the current field
+            field_number = int(field_properties[0])          #field number should be at index 0
+            field_names[field_number] = field_properties[5]  #field name should be at index 5
+            if field_number >= field_count:
+                field_count = -2                             # reset field count to stop processing field names
+        else:
+            field_count = -2  # reset field count to stop processing field names
+    return field_names
+
+
 def write_res_csv(df: pd.DataFrame, filepath="out.res.csv", file_version=3, missing_data_value="", project_name="", source_version="5.30.0.12728", datetime_format=r"%d/%m/%y") -> None:
     """Writes a dataframe to a res csv.
 
@@ -117,6 +233,9 @@ def write_res_csv(df: pd.DataFrame, filepath="out.res.csv", file_version=3, miss
         df.index = utils.standardize_datestring_format(df.index)
         df.index.name = "Date"
 
+    if isinstance(df.index, pd.DatetimeIndex):
+        # datetime index mode; string dates are only needed for writing
+        df = utils.convert_index_to_string(df.copy())
     utils.convert_index_to_string(df)
     first_date: datetime = df.index[0]
     last_date: datetime = df.index[-1]
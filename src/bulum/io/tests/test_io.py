@@ -1,8 +1,12 @@
 import unittest
 import os
+import re
+import shutil
+import tempfile
 import bulum.io as bio
 from datetime import datetime
 import bulum.utils as out
+import numpy as np
 import pandas as pd
 from timeit import default_timer as timer
 
@@ -47,6 +51,37 @@ class Tests(unittest.TestCase):
         df = bio.read_res_csv("./src/bulum/io/tests/res_csv_files/file_with_missing_vals.res.csv", custom_na_values=['100.00000000000001'])
         self.assertEqual(df.isnull().sum().sum(), 17)
 
+    def test_read_res_csv_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_dir = os.path.join(temp_dir, "res_csv_cache")
+            test_output_filename = os.path.join(temp_dir, "test_cached.res.csv")
+            shutil.copy("./src/bulum/io/tests/res_csv_files/file_with_missing_vals.res.csv", test_output_filename)
+            expected = bio.read_res_csv(test_output_filename)
+            # First read writes the sidecar, second read loads it
+            df = bio.read_res_csv(test_output_filename, cache=True, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            pd.testing.assert_frame_equal(df, expected)
+            df = bio.read_res_csv(test_output_filename, cache=True, cache_dir=cache_dir, use_field_name=True)
+            pd.testing.assert_frame_equal(df, bio.read_res_csv(test_output_filename, use_field_name=True))
+            # A truncated sidecar falls back to parsing the res csv
+            cache_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_path, "r+b") as f:
+                f.truncate(os.path.getsize(cache_path) // 2)
+            df = bio.read_res_csv(test_output_filename, cache=True, cache_dir=cache_dir)
+            pd.testing.assert_frame_equal(df, expected)
+            # Concurrent reads of the same file each write the sidecar safely
+            shutil.rmtree(cache_dir)
+            ensemble = bio.read_many([test_output_filename] * 8, keys=range(8), max_workers=8,
+                                     cache=True, cache_dir=cache_dir)
+            for df in ensemble:
+                pd.testing.assert_frame_equal(df, expected, check_frame_type=False)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            pd.testing.assert_frame_equal(bio.read_res_csv(test_output_filename, cache=True, cache_dir=cache_dir), expected)
+            # Changing the res csv invalidates the sidecar
+            bio.write_res_csv(expected.iloc[:10].copy(), test_output_filename)
+            df = bio.read_res_csv(test_output_filename, cache=True, cache_dir=cache_dir)
+            self.assertEqual(len(df), 10)
+
     def test_write_res_csv(self):
         test_output_filename = "./src/bulum/io/tests/test_outputs/test_out.res.csv"
         if os.path.isfile(test_output_filename):
@@ -77,6 +112,47 @@ class Tests(unittest.TestCase):
         # end = timer()
         # print(f"read time = {(end - start)}") # Time in seconds, e.g. 5.38091952400282
 
+    def test_read_idx_lazy(self):
+        test_idx_filename = "./src/bulum/stats/tests/da_file/nogr306a.idx"
+        df = bio.read_idx(test_idx_filename)
+        lazy_df = bio.read_idx_lazy(test_idx_filename)
+        self.assertEqual(lazy_df.shape, df.shape)
+        self.assertListEqual(list(lazy_df.columns), list(df.columns))
+        cols = [df.columns[2], df.columns[6]]
+        lazy_subset = lazy_df[cols]
+        self.assertListEqual(list(lazy_subset.columns), cols)
+        self.assertTrue(lazy_subset.equals(df[cols]))
+        self.assertEqual(out.check_df_format_standards(lazy_subset), [])
+        lazy_df32 = bio.read_idx_lazy(test_idx_filename, dtype='float32')
+        self.assertEqual(lazy_df32[cols[0]].dtype, 'float32')
+        self.assertAlmostEqual(lazy_df32[cols[0]].sum(), df[cols[0]].sum(), delta=1)
+
+    def test_read_idx_selection(self):
+        test_idx_filename = "./src/bulum/stats/tests/da_file/nogr306a.idx"
+        df = bio.read_idx(test_idx_filename)
+        df_sel = bio.read_idx(test_idx_filename, columns=[3, "PPT_216A.q13", re.compile("Isaac River at Yatton")],
+                              start="1950-01-01", end="31/12/1959")
+        self.assertEqual(len(df_sel), 3652)
+        self.assertEqual(len(df_sel.columns), 3)
+        self.assertEqual(df_sel.index[0], "1950-01-01")
+        self.assertEqual(df_sel.index[-1], "1959-12-31")
+        self.assertTrue(df_sel.equals(df.loc["1950-01-01":"1959-12-31", df_sel.columns]))
+        self.assertRaises(KeyError, bio.read_idx, test_idx_filename, columns="not a column")
+
+    def test_read_idx_record_count(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_idx_filename = os.path.join(tmp_dir, "nogr306a.idx")
+            shutil.copy("./src/bulum/stats/tests/da_file/nogr306a.idx", test_idx_filename)
+            shutil.copy("./src/bulum/stats/tests/da_file/nogr306a.out", os.path.join(tmp_dir, "nogr306a.out"))
+            df = bio.read_idx(test_idx_filename)
+            # Append an extra record to the ".out" file
+            with open(os.path.join(tmp_dir, "nogr306a.out"), "ab") as f:
+                f.write(bytes(4 * len(df.columns)))
+            self.assertRaises(ValueError, bio.read_idx, test_idx_filename)
+            # A window of dates within the file can still be read
+            df_sel = bio.read_idx(test_idx_filename, start="1950-01-01", end="1959-12-31")
+            self.assertTrue(df_sel.equals(df.loc["1950-01-01":"1959-12-31"]))
+
     def test_write_idx(self):
         # start = timer()
         # delete test output if it already exists
@@ -114,6 +190,67 @@ class Tests(unittest.TestCase):
         self.assertAlmostEqual(df["M_L1#065.01d"].sum(), 53179857.30745)
         self.assertAlmostEqual(df["three"].sum(), 19922893.66192)
 
+    def test_read_iqqm_lqn_outputs(self):
+        filenames = ["./src/bulum/io/tests/M_L1#030.01d", "./src/bulum/io/tests/M_L1#065.01d"]
+        df = bio.read_iqqm_lqn_outputs(filenames, col_names=["030", "065"])
+        self.assertListEqual(df.columns.to_list(), ["030", "065"])
+        self.assertEqual(df.index[0], "1890-01-01")
+        self.assertEqual(df.index[-1], "2008-12-31")
+        self.assertAlmostEqual(df["030"].sum(), 19922893.66192)
+        self.assertAlmostEqual(df["065"].sum(), 53179857.30745)
+        # Records with missing values are parsed by the fallback reader
+        with open("./src/bulum/io/tests/M_L1#030.01d") as f:
+            header = [next(f) for _ in range(6)]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for records, expected in [(["01/01/1890 1.0", "02/01/1890", "03/01/1890 3.0"], [1.0, np.nan, 3.0]),
+                                      (["01/01/1890 1.0", "02/01/1890", "03/01/1890", "04/01/1890 4.0"], [1.0, np.nan, np.nan, 4.0])]:
+                filename = os.path.join(temp_dir, "missing.01d")
+                with open(filename, "w") as f:
+                    f.writelines(header + [r + "\n" for r in records])
+                df = bio.read_iqqm_lqn_output(filename, col_name="x")
+                self.assertListEqual(df.index.to_list(), out.get_date_strings("1890-01-01", len(records)))
+                np.testing.assert_array_equal(df["x"].to_numpy(dtype=float), expected)
+
+    def test_join_builder(self):
+        df = bio.read_iqqm_lqn_output("./src/bulum/io/tests/M_L1#030.01d")
+        df = bio.read_iqqm_lqn_output("./src/bulum/io/tests/M_L1#065.01d", df=df)
+        df = df.join(bio.read_ts_csv("./src/bulum/io/tests/test_data.csv"), how="outer")
+        builder = bio.TimeseriesJoinBuilder()
+        builder.read("./src/bulum/io/tests/M_L1#030.01d")
+        builder.read("./src/bulum/io/tests/M_L1#065.01d", reader=bio.read_iqqm_lqn_output)
+        builder.add(bio.read_ts_csv("./src/bulum/io/tests/test_data.csv"))
+        self.assertEqual(len(builder), 3)
+        pd.testing.assert_frame_equal(builder.build(), df, check_dtype=False)
+        builder.read("./src/bulum/io/tests/M_L1#030.01d")
+        self.assertRaises(ValueError, builder.build)
+        # Unsorted and duplicated dates
+        dates = ["2000-01-03", "2000-01-01", "2000-01-02"]
+        builder = bio.TimeseriesJoinBuilder()
+        builder.add(pd.DataFrame({"a": [3.0, 1.0, 2.0]}, index=dates))
+        builder.add(pd.DataFrame({"b": [2.0, 3.0]}, index=dates[-1:] + dates[:1]))
+        df = builder.build()
+        self.assertListEqual(df.index.to_list(), sorted(dates))
+        self.assertListEqual(df["a"].to_list(), [1.0, 2.0, 3.0])
+        self.assertListEqual(df["b"].to_list()[1:], [2.0, 3.0])
+        builder.add(pd.DataFrame({"c": [1.0, 2.0]}, index=dates[:1] * 2))
+        self.assertRaises(ValueError, builder.build)
+
+    def test_read_many(self):
+        paths = ["./src/bulum/io/tests/M_L1#030.01d", "./src/bulum/io/tests/M_L1#065.01d", "./src/bulum/io/tests/not_a_file.res.csv"]
+        errors = {}
+        progress = []
+        ensemble = bio.read_many(paths, keys=["030", "065", "missing"], errors=errors,
+                                 progress=lambda done, total, path: progress.append((done, total)))
+        self.assertListEqual(list(ensemble.ensemble.keys()), ["030", "065"])
+        self.assertAlmostEqual(ensemble.get("065")["M_L1#065.01d"].sum(), 53179857.30745)
+        self.assertEqual(ensemble.get("030").source, paths[0])
+        self.assertListEqual(list(errors.keys()), [paths[2]])
+        self.assertEqual(progress[-1], (3, 3))
+        df = bio.read_many(paths[:2], wide=True, max_workers=2)
+        self.assertListEqual(df.columns.to_list(), ["M_L1#030.01d", "M_L1#065.01d"])
+        self.assertAlmostEqual(df["M_L1#030.01d"].sum(), 19922893.66192)
+        self.assertRaises(ValueError, bio.read_many, [paths[0], paths[0]], wide=True)
+
     # def test_iqqm_out_reader(self):
     #     reader = oio.iqqm_out_reader("./src/bulum/io/tests/iqqm_results/O02l.IQN") #O02l.IQN
     #     reader.require(node="030", output="01") #node_number, rec_number.
@@ -4,7 +4,15 @@ from bulum import utils
 from datetime import datetime, timedelta
 
 
-
+def _annual_totals(df: pd.DataFrame, wy_month=7, allow_part_years=False):
+    """Helper for the annual statistics. Crops to complete water years (unless
+    allow_part_years) and returns water year totals, or None if there are no
+    data left after cropping."""
+    if not allow_part_years:
+        df = utils.crop_to_wy(df, wy_month)
+        if len(df) == 0:
+            return None
+    return df.groupby(utils.get_wy(df.index, wy_month)).sum()
 
 
 def annual_max(df: pd.DataFrame, wy_month=7, allow_part_years=False):
@@ -18,14 +26,10 @@ def annual_max(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     Returns:
         _type_: _description_
     """
-    if (allow_part_years):
-        return df.groupby(utils.get_wy(df.index, wy_month)).sum().max()
-    else:
-        cropped_df = utils.crop_to_wy(df, wy_month)
-        if (len(cropped_df) > 0):
-            return cropped_df.groupby(utils.get_wy(cropped_df.index, wy_month)).sum().max()
-        else:
-            return np.nan
+    annual_totals = _annual_totals(df, wy_month, allow_part_years)
+    if annual_totals is None:
+        return np.nan
+    return annual_totals.max()
 
 def annual_min(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     """Returns the minimum annual for a daily timeseries dataframe.
@@ -38,14 +42,10 @@ def annual_min(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     Returns:
         _type_: _description_
     """
-    if (allow_part_years):
-        return df.groupby(utils.get_wy(df.index, wy_month)).sum().min()
-    else:
-        cropped_df = utils.crop_to_wy(df, wy_month)
-        if (len(cropped_df) > 0):
-            return cropped_df.groupby(utils.get_wy(cropped_df.index, wy_month)).sum().min()
-        else:
-            return np.nan
+    annual_totals = _annual_totals(df, wy_month, allow_part_years)
+    if annual_totals is None:
+        return np.nan
+    return annual_totals.min()
 
 def annual_mean(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     """Returns the mean annual for a daily timeseries dataframe.
@@ -58,14 +58,10 @@ def annual_mean(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     Returns:
         _type_: _description_
     """
-    if (allow_part_years):
-        return df.groupby(utils.get_wy(df.index, wy_month)).sum().mean()
-    else:
-        cropped_df = utils.crop_to_wy(df, wy_month)
-        if (len(cropped_df) > 0):
-            return cropped_df.groupby(utils.get_wy(cropped_df.index, wy_month)).sum().mean()
-        else:
-            return np.nan
+    annual_totals = _annual_totals(df, wy_month, allow_part_years)
+    if annual_totals is None:
+        return np.nan
+    return annual_totals.mean()
 
 def annual_median(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     """Returns the median annual for a daily timeseries dataframe.
@@ -78,14 +74,10 @@ def annual_median(df: pd.DataFrame, wy_month=7, allow_part_years=False):
     Returns:
         _type_: _description_
     """
-    if (allow_part_years):
-        return df.groupby(utils.get_wy(df.index, wy_month)).sum().median()
-    else:
-        cropped_df = utils.crop_to_wy(df, wy_month)
-        if (len(cropped_df) > 0):
-            return cropped_df.groupby(utils.get_wy(cropped_df.index, wy_month)).sum().median()
-        else:
-            return np.nan
+    annual_totals = _annual_totals(df, wy_month, allow_part_years)
+    if annual_totals is None:
+        return np.nan
+    return annual_totals.median()
         
 def annual_percentile(df: pd.DataFrame, q, wy_month=7, allow_part_years=False):
     """Returns the annual percentile(q) for a daily timeseries dataframe.
@@ -102,15 +94,51 @@ def annual_percentile(df: pd.DataFrame, q, wy_month=7, allow_part_years=False):
     if not isinstance(q,list):
         q=[q]
 
-    if (allow_part_years):
-        temp=df.groupby(utils.get_wy(df.index, wy_month)).sum().apply(lambda x: np.percentile(x,q))#.reindex(q)
-        temp.index=q
-        return temp
-    else:
-        cropped_df = utils.crop_to_wy(df, wy_month)
-        if (len(cropped_df) > 0):
-            temp=cropped_df.groupby(utils.get_wy(cropped_df.index, wy_month)).sum().apply(lambda x: np.percentile(x,q))
-            temp.index=q
-            return temp
+    annual_totals = _annual_totals(df, wy_month, allow_part_years)
+    if annual_totals is None:
+        return np.nan
+    temp=annual_totals.apply(lambda x: np.percentile(x,q))
+    temp.index=q
+    return temp
+
+
+def annual_summary(df: pd.DataFrame, stats=None, wy_month=7, allow_part_years=False):
+    """Returns several annual statistics for a daily timeseries dataframe in one
+    pass. The dataframe is cropped and grouped into water year totals once, and
+    every requested statistic is computed from those totals. This is equivalent
+    to (but faster than) calling annual_max, annual_min, annual_mean,
+    annual_median and annual_percentile separately.
+
+    Args:
+        df (pd.DataFrame): Dataframe with date as index
+        stats (list, optional): Statistics to compute. Each item is one of "max", "min", "mean", "median", or a number between 0 and 100 for the corresponding percentile. Defaults to ["max", "min", "mean", "median"].
+        wy_month (int, optional): Water year start month. Defaults to 7.
+        allow_part_years (bool, optional): Allow part water years or only complete water years. Defaults to False.
+
+    Returns:
+        pd.DataFrame: Statistics as rows (labelled as per `stats`) and columns as per df. If df is a pd.Series, a pd.Series indexed by `stats` is returned.
+    """
+    if stats is None:
+        stats = ["max", "min", "mean", "median"]
+    if not isinstance(stats, list):
+        stats = [stats]
+    annual_totals = _annual_totals(df, wy_month, allow_part_years)
+    results = []
+    for stat in stats:
+        if annual_totals is None:
+            results.append(np.nan)
+        elif stat in ["max", "min", "mean", "median"]:
+            results.append(getattr(annual_totals, stat)())
+        elif isinstance(stat, (int, float)) and not isinstance(stat, bool):
+            values = np.percentile(annual_totals, stat, axis=0)
+            if isinstance(annual_totals, pd.DataFrame):
+                values = pd.Series(values, index=annual_totals.columns)
+            results.append(values)
         else:
-            return np.nan
+            raise ValueError(f"Unsupported statistic: {stat}")
+    if isinstance(df, pd.Series):
+        return pd.Series([float(r) for r in results], index=stats, name=df.name)
+    answer = pd.DataFrame([r if isinstance(r, pd.Series) else pd.Series(r, index=df.columns) for r in results],
+                          columns=df.columns)
+    answer.index = stats
+    return answer
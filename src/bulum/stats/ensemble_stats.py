@@ -3,6 +3,15 @@ import numpy as np
 from bulum import utils
 from datetime import datetime, timedelta
 
+def _ensemble_matrix(input: utils.DataframeEnsemble, variable: str):
+    """Helper returning the shared date index and a (day x replicate) float64
+    matrix of `variable` across the ensemble DataFrames. Uses a view into the
+    ensemble's columnar store where possible."""
+    if isinstance(input, utils.DataframeEnsemble) and input.is_aligned():
+        return input.index, input.variable_matrix(variable)
+    temp=pd.concat([x[variable] for x in input],axis=1)
+    return temp.index, temp.to_numpy(dtype='float64')
+
 def cumulative_risk(input: utils.DataframeEnsemble, variable: str, parameters: list):
     """Returns a timeseries of cumulative risk for each parameter i.e. probability (as a proportion of ensemble DataFrames) of variable having been below a certain parameter at least once by a given date in the timeseries.
 
@@ -17,20 +26,15 @@ def cumulative_risk(input: utils.DataframeEnsemble, variable: str, parameters: l
     if not isinstance(parameters, list):
         parameters=[parameters]     
     cumu_dict={}
-    temp=pd.concat([x[variable] for x in input],axis=1)
-    no_repl=len(temp.columns)
+    index, values=_ensemble_matrix(input, variable)
+    no_days, no_repl=values.shape
+    repl_ind=np.arange(no_repl)
     for v in parameters:
-        cumulative=temp.copy(deep=True)
-        for i in range(len(temp.columns)):
-            if min(cumulative.iloc[:,i])<v:                                              #An event occurred at least once this replicate
-                cumu_ind=cumulative.index[cumulative.iloc[:,i]<v][0]                         #Find the index of the first occurrence
-                cumu_ind_int=list(cumulative.index).index(cumu_ind)                          #Convert index to an integer
-                cumulative.iloc[:,i]=0                                                       #Initally set all days to '0' i.e. did not occur
-                cumulative.iloc[cumu_ind_int:,i]=1                                           #Update all days including and post first occurrence index to '1' i.e. has occurred
-            else:                                                                        #An event did not occur this replicate
-                cumulative.iloc[:,i]=0                                                       #Set all days to '0' i.e. did not occur
-
-        cumu_dict[f"{str(v)}"]=cumulative.apply(lambda x: sum(x)/no_repl*100,axis=1).rename(variable) #Set 
+        below=values<v                                                                   #Boolean matrix of days (rows) x replicates (columns) below the parameter
+        first_ind=below.argmax(axis=0)                                                   #Index of the first occurrence in each replicate (0 if none)
+        occurred=below[first_ind,repl_ind]                                               #Whether an event occurred at least once in each replicate
+        first_counts=np.bincount(first_ind[occurred],minlength=no_days)                  #Number of replicates with their first occurrence on each day
+        cumu_dict[f"{str(v)}"]=pd.Series(np.cumsum(first_counts)/no_repl*100,index=index,name=variable)
     return cumu_dict
 
 def percentile_envelope(input: utils.DataframeEnsemble, variable: str, parameters: list):
@@ -47,9 +51,10 @@ def percentile_envelope(input: utils.DataframeEnsemble, variable: str, parameter
     if not isinstance(parameters, list):
         parameters=[parameters]     
     env_dict={}
-    temp=pd.concat([x[variable] for x in input],axis=1)
-    for v in parameters:
-        env_dict[f"{str(v)}"]=temp.apply(lambda x: np.percentile(x,v), axis=1).rename(variable)
+    index, values=_ensemble_matrix(input, variable)
+    envelopes=np.percentile(values,parameters,axis=1)                                    #All percentiles in one call, shape (parameters x days)
+    for v, envelope in zip(parameters, envelopes):
+        env_dict[f"{str(v)}"]=pd.Series(envelope,index=index,name=variable)
     return env_dict
 
 def incremental_risk(input: utils.DataframeEnsemble, variable: str, parameters: list):
@@ -66,10 +71,10 @@ def incremental_risk(input: utils.DataframeEnsemble, variable: str, parameters:
     if not isinstance(parameters, list):
         parameters=[parameters]    
     inc_dict={}
-    temp=pd.concat([x[variable] for x in input],axis=1)
-    no_repl=len(temp.columns)
+    index, values=_ensemble_matrix(input, variable)
+    no_repl=values.shape[1]
     for v in parameters:
-        inc_dict[f"{str(v)}"]=temp.apply(lambda x: sum(np.where(x<v,1,0))/no_repl*100,axis=1).rename(variable)
+        inc_dict[f"{str(v)}"]=pd.Series(np.count_nonzero(values<v,axis=1)/no_repl*100,index=index,name=variable)
     return inc_dict
 
 def annual_incremental_risk(input: utils.DataframeEnsemble, variable: str, parameters: list, min_count=7):
@@ -87,7 +92,8 @@ def annual_incremental_risk(input: utils.DataframeEnsemble, variable: str, param
     if not isinstance(parameters, list):
         parameters=[parameters] 
     ann_inc_dict={}
-    temp=pd.concat([x[variable] for x in input],axis=1)
+    index, values=_ensemble_matrix(input, variable)
+    temp=pd.DataFrame(values,index=index)
     no_repl=len(temp.columns)
     for v in parameters:
         ann_inc_dict[f"{str(v)}"]=temp.groupby(utils.get_wy(temp.index)).aggregate(lambda x: sum(np.where(x<v,1,0))).apply(lambda x: sum(np.where(x>=min_count,1,0))/no_repl*100,axis=1).rename(variable).rename_axis("Date")
@@ -1,11 +1,76 @@
 import pandas as pd
 import numpy as np
-import calendar
 from bulum import utils
 from datetime import datetime, timedelta
 from typing import Union
 from typing import Literal
 
+# Days in each month of a non-leap year
+_MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def _is_leap(years: np.ndarray) -> np.ndarray:
+    """Vectorized calendar.isleap for an array of years."""
+    return (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+def _days_in_month(dates, ignore_leap_years=False) -> np.ndarray:
+    """Returns the number of days in the month of each date, as an array of ints.
+
+    Args:
+        dates (pd.Index): Dates as "%Y-%m-%d" strings or datetimes.
+        ignore_leap_years (bool, optional): Always use 28 days in Feb. Defaults to False.
+    """
+    cal = utils.get_calendar(dates)
+    days = _MONTH_DAYS[cal.month - 1]
+    if not ignore_leap_years:
+        days = days + ((cal.month == 2) & _is_leap(cal.year))
+    return days
+
+def _days_in_wy(dates, wy_month=7, ignore_leap_years=False) -> np.ndarray:
+    """Returns the number of days in the water year of each date, as an array of ints.
+
+    Args:
+        dates (pd.Index): Dates as "%Y-%m-%d" strings or datetimes.
+        wy_month (int, optional): Water year start month. Defaults to 7.
+        ignore_leap_years (bool, optional): Always use 365 days. Defaults to False.
+    """
+    cal = utils.get_calendar(dates)
+    if ignore_leap_years:
+        return np.full(len(cal), 365)
+    # If wy_month > 2, leap day will occur in the next calendar year
+    wy = cal.wy(wy_month, using_end_year=False)
+    return 365 + _is_leap(wy + 1 if wy_month > 2 else wy)
+
+def _complete_months_mask(dates) -> np.ndarray:
+    """Returns a boolean mask of the dates that fall within complete months.
+
+    Args:
+        dates (pd.Index): Consecutive daily dates as "%Y-%m-%d" strings or datetimes.
+    """
+    if isinstance(dates, pd.DatetimeIndex):
+        #Datetime index; crop to complete months without string handling
+        np_dates = utils.dates_to_np_datetimes64d(dates)
+        first_month = np_dates[0].astype('datetime64[M]')
+        last_month = np_dates[-1].astype('datetime64[M]')
+        start_date = first_month.astype('datetime64[D]')
+        if np_dates[0] != start_date:
+            #Start on the first date of the next month
+            start_date = (first_month + 1).astype('datetime64[D]')
+        end_date = (last_month + 1).astype('datetime64[D]') - 1
+        if np_dates[-1] != end_date:
+            end_date = last_month.astype('datetime64[D]') - 1
+        return (np_dates >= start_date) & (np_dates <= end_date)
+    if dates[0][8:10]=="01": #0123-56-89
+        #First date is the start of a month; use this as start date.
+        start_date=dates[0]
+    else:
+        #Start on the first date of the next month
+        start_date = utils.get_next_month_start(dates[0])
+    if dates[-1] == utils.get_this_month_end(dates[-1]):
+        end_date=dates[-1]
+    else:
+        end_date=utils.get_prev_month_end(dates[-1])
+    return (dates >= start_date) & (dates <= end_date)
+
 class Reliability:
 
     def __init__(self, demand: Union[pd.Series,list,float,int], supply: pd.Series, demand_timescale: Literal["daily","monthly","yearly"]="daily", demand_type: Literal["total","daily_constant"]="total", ignore_leap_years=False, quiet=False) -> None:
@@ -89,15 +154,27 @@ class Reliability:
         self.demand_type=demand_type
         self.ignore_leap_years=ignore_leap_years
         self.state=state
+
+        # Demand timeseries built by ReliabilityTS, keyed by wy_month where it matters
+        self._demand_ts_cache={}
         
     def ReliabilityTS(self, wy_month):
         """Returns demand as a timeseries for input to reliability statistics. Matches date range of supply timeseries input.
 
         Args:
+            wy_month (int): Water year start month. Only used to disaggregate yearly totals.
 
         Returns:
             pd.Series: Demand timeseries for input to reliability stats
         """
+        # Demand is built once per instance (and wy_month for yearly totals), then reused.
+        key = wy_month if self.state=="yearly_total" else None
+        if key not in self._demand_ts_cache:
+            self._demand_ts_cache[key] = self._build_demand_ts(wy_month)
+        return self._demand_ts_cache[key].copy()
+
+    def _build_demand_ts(self, wy_month):
+        """Builds the demand timeseries returned by ReliabilityTS."""
         # If provided demand is a timeseries, just return timeseries.
         if self.state=="ts":
             common_dates=np.intersect1d(self.demand.index,self.supply.index)
@@ -116,38 +193,24 @@ class Reliability:
             
             # Overwrite demand_ts with respective month constant daily demand
             if self.state=="monthly_constant_list":
-                month_list=list(utils.get_month(demand_ts.index))
-                demand_ts[:]=[self.demand[x-1] for x in month_list]
+                month=utils.get_calendar(demand_ts.index).month
+                demand_ts[:]=np.asarray(self.demand)[month-1]
                 return demand_ts
 
             # Overwrite demand_ts with respective total month demand disaggregated to daily.
             if self.state=="monthly_total_list":
-                year_month=utils.get_year_and_month(demand_ts.index)
-                if self.ignore_leap_years == False:
-                    demand_ts[:]=[self.demand[int(x[5:7])-1]/calendar.monthrange(int(x[0:4]),int(x[5:7]))[1] for x in year_month] # If using leap years, divide by 28 or 29 Feb days depending on year
-                else:
-                    demand_ts[:]=[self.demand[int(x[5:7])-1]/calendar.monthrange(2002,int(x[5:7]))[1] for x in year_month] # If not using leap years, only divide by 28 Feb days
+                month=utils.get_calendar(demand_ts.index).month
+                demand_ts[:]=np.asarray(self.demand,dtype=np.float64)[month-1]/_days_in_month(demand_ts.index,self.ignore_leap_years) # If not using leap years, only divide by 28 Feb days
                 return demand_ts
             
             # Overwrite demand_ts with total month demand disaggregated to daily.
             if self.state=="monthly_total":
-                year_month=utils.get_year_and_month(demand_ts.index)
-                if self.ignore_leap_years == False:
-                    demand_ts[:]=[self.demand/calendar.monthrange(int(x[0:4]),int(x[5:7]))[1] for x in year_month] # If using leap years, divide by 28 or 29 Feb days depending on year
-                else:
-                    demand_ts[:]=[self.demand/calendar.monthrange(2002,int(x[5:7]))[1] for x in year_month] # If not using leap years, only divide by 28 Feb days
+                demand_ts[:]=self.demand/_days_in_month(demand_ts.index,self.ignore_leap_years) # If not using leap years, only divide by 28 Feb days
                 return demand_ts
 
             # Overwrite demand_ts with total annual demand disaggregated to daily.
             if self.state=="yearly_total":
-                if self.ignore_leap_years == False:
-                    wy = utils.get_wy(demand_ts.index,wy_month,using_end_year=False)
-                    if wy_month>2:
-                        demand_ts[:]=[self.demand/(365+calendar.isleap(x+1)) for x in wy] # If using leap years, divide by 365 or 366 days depending on year. If wy_month > 2, leap day will occur in the next calendar year
-                    else:
-                        demand_ts[:]=[self.demand/(365+calendar.isleap(x)) for x in wy] # If using leap years, divide by 365 or 366 days depending on year. If wy_month <= 2, leap day will occur in this calendar year
-                else:
-                    demand_ts[:]=self.demand/365 # If not using leap years, only ever divide by 365                    
+                demand_ts[:]=self.demand/_days_in_wy(demand_ts.index,wy_month,self.ignore_leap_years) # If not using leap years, only ever divide by 365
                 return demand_ts
 
 
@@ -170,18 +233,9 @@ class Reliability:
             dem_month=demand_ts.groupby(utils.get_year_and_month(demand_ts.index)).sum()
             sup_month=self.supply.groupby(utils.get_year_and_month(self.supply.index)).sum()
         else:
-            if self.supply.index[0][8:10]=="01": #0123-56-89
-                #First date is the start of a month; use this as start date.
-                start_date=self.supply.index[0]
-            else:
-                #Start on the first date of the next month
-                start_date = utils.get_next_month_start(self.supply.index[0])
-            if self.supply.index[-1] == utils.get_this_month_end(self.supply.index[-1]):
-                end_date=self.supply.index[-1]
-            else:
-                end_date=utils.get_prev_month_end(self.supply.index[-1])
-            demand_trim = demand_ts[start_date:end_date]
-            supply_trim = self.supply[start_date:end_date]
+            in_range = _complete_months_mask(self.supply.index)
+            demand_trim = demand_ts[in_range]
+            supply_trim = self.supply[in_range]
             year_month = utils.get_year_and_month(demand_trim.index)
             dem_month=demand_trim.groupby(year_month).sum()
             sup_month=supply_trim.groupby(year_month).sum()
@@ -223,3 +277,69 @@ class Reliability:
         rel=np.where((sup_annual-(dem_annual*tol)<-0.000001),0,1).sum()/no_years
 
         return rel
+
+
+def reliability_surface(demands: list, supply: Union[pd.Series,pd.DataFrame], tolerances=[1], timescale: Literal["monthly","annual"]="annual", demand_timescale: Literal["daily","monthly","yearly"]="daily", demand_type: Literal["total","daily_constant"]="total", ignore_leap_years=False, wy_month=7, allow_part_periods=False) -> pd.DataFrame:
+    """Returns monthly or annual reliability for every combination of demand, tolerance and supply series.
+    Equivalent to calling Reliability(demand, supply, ...).MonthlyReliability or AnnualReliability for each
+    combination, but each supply series is aggregated to monthly or annual totals only once.
+
+    Args:
+        demands (list): List of demands, each of which may be any demand accepted by Reliability.
+        supply (Union[pd.Series,pd.DataFrame]): Daily supply timeseries with date as index, or a DataFrame of supply series (e.g. replicates) as columns.
+        tolerances (list, optional): List of tolerances, as percentage of demand treated as full demand. Defaults to [1].
+        timescale (Literal["monthly","annual"], optional): Monthly or annual reliability. Defaults to "annual".
+        demand_timescale (Literal["daily","monthly","yearly"], optional): See Reliability. Defaults to "daily".
+        demand_type (Literal["total","daily_constant"], optional): See Reliability. Defaults to "total".
+        ignore_leap_years (bool, optional): See Reliability. Defaults to False.
+        wy_month (int, optional): Water year start month. Defaults to 7.
+        allow_part_periods (bool, optional): Allow part months (monthly) or part water years (annual). Defaults to False.
+
+    Returns:
+        pd.DataFrame: Reliability indexed by Demand (the position of the demand in demands), Demand value (the demand if it is a scalar, otherwise NaN) and Tolerance, with a column per supply series.
+    """
+    if timescale not in ["monthly","annual"]:
+        raise Exception("timescale must be one of \"monthly\" or \"annual\".")
+    if type(supply) == pd.Series:
+        supply = supply.to_frame()
+    if type(supply) != pd.DataFrame:
+        raise Exception("Supply must be a date-indexed pd.Series or pd.DataFrame.")
+
+    # Build each demand timeseries against the supply dates, and enforce a common date range
+    demands = [d.item() if isinstance(d, np.generic) else d for d in demands]
+    demand_ts = [Reliability(demand, supply.iloc[:,0], demand_timescale, demand_type, ignore_leap_years, quiet=True).ReliabilityTS(wy_month) for demand in demands]
+    dates = supply.index
+    for ts in demand_ts:
+        if len(ts) != len(dates):
+            dates = dates[dates.isin(ts.index)]
+    demand_df = pd.DataFrame({i: ts.reindex(dates).to_numpy() for i,ts in enumerate(demand_ts)}, index=dates)
+    supply_df = supply.loc[dates]
+
+    # Collate timeseries data to monthly or annual, once for all demands and supplies
+    if timescale == "monthly":
+        if not allow_part_periods:
+            in_range = _complete_months_mask(dates)
+            demand_df = demand_df[in_range]
+            supply_df = supply_df[in_range]
+        keys = utils.get_year_and_month(demand_df.index)
+    else:
+        if not allow_part_periods:
+            demand_df = utils.crop_to_wy(demand_df, wy_month)
+            supply_df = utils.crop_to_wy(supply_df, wy_month)
+        keys = utils.get_wy(demand_df.index, wy_month)
+
+    out_index = pd.MultiIndex.from_tuples([(i, d if np.isscalar(d) else np.nan, tol) for i,d in enumerate(demands) for tol in tolerances],
+                                          names=["Demand","Demand value","Tolerance"])
+    if len(demand_df) == 0:
+        return pd.DataFrame(np.nan, index=out_index, columns=supply.columns)
+    dem_period = demand_df.groupby(keys).sum().to_numpy(dtype=np.float64)
+    sup_period = supply_df.groupby(keys).sum().to_numpy(dtype=np.float64)
+    no_periods = len(sup_period)
+
+    # Check whether demand is met within given tolerance (to 6 decimal places), broadcasting
+    # (period x demand x supply) for each tolerance, and express as a percentage
+    out = np.empty((len(demands), len(tolerances), supply.shape[1]))
+    for j,tol in enumerate(tolerances):
+        failed = sup_period[:, np.newaxis, :] - (dem_period * tol)[:, :, np.newaxis] < -0.000001
+        out[:, j, :] = np.count_nonzero(~failed, axis=0) / no_periods
+    return pd.DataFrame(out.reshape(-1, supply.shape[1]), index=out_index, columns=supply.columns)
@@ -1,9 +1,35 @@
 import pandas as pd
 import numpy as np
 from bulum import utils
+from .ensemble_stats import _ensemble_matrix
 from datetime import datetime, timedelta
 from typing import Union
 
+def _events_below(values: np.ndarray, triggers: list) -> list:
+    """Run-length engine for events at or below trigger thresholds. All triggers
+    are assessed in one pass over a (trigger x day) mask. Missing values neither
+    count towards nor end an event.
+
+    Args:
+        values (np.ndarray): Daily storage data.
+        triggers (list): List of trigger thresholds.
+
+    Returns:
+        list: (start positions, lengths) arrays of the events for each trigger.
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    below = np.zeros((len(triggers), len(valid) + 2), dtype=np.int8)
+    below[:, 1:-1] = values[valid][np.newaxis, :] <= np.asarray(triggers, dtype=np.float64)[:, np.newaxis]
+    edges = np.diff(below, axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    splits = np.searchsorted(start_rows, np.arange(1, len(triggers)))
+    return [(valid[s], l) for s, l in zip(np.split(starts, splits), np.split(lengths, splits))]
+
+# Minimum event lengths (days) counted in the storage level assessment summaries
+SUMMARY_EVENT_LENGTHS = [1, 7, 30, 91, 183, 365]
+
 class StorageLevelAssessment:
         
     def __init__(self, df: pd.Series, triggers: list, wy_month=7, allow_part_years=False) -> None:
@@ -31,14 +57,27 @@ class StorageLevelAssessment:
         self.start_date=df.index[0]
         self.end_date=df.index[-1]
 
-        # Run event algorithm on init. 
-        self.events = {trigger: self.EventsBelowTriggerAlgorithm(trigger) for trigger in self.triggers}      
+        # Run event algorithm on init, for all triggers at once.
+        events = _events_below(self.df.to_numpy(dtype=np.float64), self.triggers)
+        self.event_starts = {trigger: self.df.index[starts].to_numpy() for trigger, (starts, _) in zip(self.triggers, events)}
+        self.event_lengths = {trigger: lengths for trigger, (_, lengths) in zip(self.triggers, events)}
+        self.events = {trigger: lengths.tolist() for trigger, lengths in self.event_lengths.items()}
 
         # Get name of df Series
         self.columnname=self.df.name
 
+        # Cache annual days below for all triggers from a single WY groupby
+        values = self.df.to_numpy(dtype=np.float64)
+        dailytrigger = pd.DataFrame({i: np.where(values<=trigger,1,0) for i,trigger in enumerate(self.triggers)},index=self.df.index)
+        annualdaysbelow = dailytrigger.groupby(utils.get_wy(self.df.index, self.wy_month)).sum()
+        self._annual_days_below = {trigger: annualdaysbelow[i].rename(None) for i,trigger in enumerate(self.triggers)}
+        self._number_years = {trigger: int(np.count_nonzero(x.to_numpy() > 0)) for trigger,x in self._annual_days_below.items()}
+
+        # Cache event length histograms, as counts of events at least each length long
+        self._events_at_least = {trigger: np.cumsum(np.bincount(x)[::-1])[::-1] for trigger,x in self.event_lengths.items()}
+
         # Get count of WYs
-        self.wy_count = self.df.groupby(utils.get_wy(self.df.index, self.wy_month)).sum().count()
+        self.wy_count = len(annualdaysbelow)
 
     def AnnualDaysBelow(self):
         """Returns the total days at or below trigger threshold by WY.
@@ -47,8 +86,7 @@ class StorageLevelAssessment:
             dict: Dictionary of annual timeseries grouped by trigger threshold.
         """
 
-        dailytrigger = {trigger:pd.Series(np.where(self.df<=trigger,1,0),index=self.df.index) for trigger in self.triggers}
-        annualdaysbelow = {trigger: x.groupby(utils.get_wy(x.index, self.wy_month)).sum() for trigger,x in dailytrigger.items()}
+        annualdaysbelow = {trigger: x.copy() for trigger,x in self._annual_days_below.items()}
         return annualdaysbelow
     
     def AnnualDaysBelowSummary(self,trigger=None,annualdaysbelow=None):
@@ -62,9 +100,9 @@ class StorageLevelAssessment:
             df: DataFrame of total days at or below threshold by WY, grouped by trigger threshold.
         """
 
-        # If not provided, calculate AnnualDaysBelow
+        # If not provided, use cached AnnualDaysBelow
         if annualdaysbelow==None:
-            annualdaysbelow = self.AnnualDaysBelow()
+            annualdaysbelow = self._annual_days_below
 
         # Output as DataFrame
         out_df=pd.DataFrame(annualdaysbelow)
@@ -84,9 +122,9 @@ class StorageLevelAssessment:
             dict: Dictionary of total years grouped by trigger threshold.
         """
 
-        # If not provided, calculate AnnualDaysBelow        
+        # If not provided, use cached result
         if annualdaysbelow==None:
-            annualdaysbelow = self.AnnualDaysBelow()
+            return dict(self._number_years)
 
         numberyears = {trigger: sum(1 if x > 0 else 0 for x in v) for trigger,v in annualdaysbelow.items()}
         return numberyears
@@ -101,9 +139,9 @@ class StorageLevelAssessment:
             dict: Dictionary of percent years grouped by trigger threshold.
         """
 
-        # If not provided, calculate NumberWaterYearsBelow
+        # If not provided, use cached NumberWaterYearsBelow
         if numberyears==None:
-            numberyears = self.NumberWaterYearsBelow()
+            numberyears = self._number_years
 
         percyears = {trigger: x/self.wy_count for trigger,x in numberyears.items()}
         return percyears
@@ -118,47 +156,8 @@ class StorageLevelAssessment:
             list: Array where each item represents the length of a single continuous event.
         """
 
-        previous_ended=True
-        length_counter=0
-        event_counter=0
-        output=[]
-
-        # Determine last df index
-        list_len = len(self.df)-1
-
-        # For every daily value in df
-        for index, x in enumerate(self.df):
-
-            ## Storage less than or equal to trigger and currently in event
-            # Add to count
-            if x <= trigger and previous_ended==False:
-                length_counter=length_counter+1
-
-            ## Storage less than or equal to trigger and not in an event
-            # Append current length count to output array (if not in first event)
-            # Start new event
-            # Add to count
-            if x <= trigger and previous_ended:
-                # If not first event
-                if event_counter > 0:
-                    output.append(length_counter)
-                    length_counter=0
-                previous_ended=False
-                length_counter=length_counter+1
-                event_counter=event_counter+1
-            
-            ## Storage greater than trigger
-            # End current event
-            if x > trigger:
-                previous_ended=True
-
-            # If at last day, append current length count to output array
-            if index==list_len:
-                if event_counter > 0:
-                    output.append(length_counter)
-                    length_counter=0
-
-        return output
+        _, lengths = _events_below(self.df.to_numpy(dtype=np.float64), [trigger])[0]
+        return lengths.tolist()
 
     def EventsBelowTrigger(self,length=1):
         """Returns event length array for each trigger threshold.
@@ -170,8 +169,21 @@ class StorageLevelAssessment:
             dict: Dictionary of event length arrays, grouped by trigger threshold.
         """
 
-        trunc_events = {k:[i for i in x if i>=length] for k,x in self.events.items()}
+        trunc_events = {k:x[x>=length].tolist() for k,x in self.event_lengths.items()}
         return trunc_events
+
+    def EventsBelowTriggerStartDates(self,length=1):
+        """Returns event start date array for each trigger threshold, corresponding to EventsBelowTrigger.
+
+        Args:
+            length (int, optional): Optional minimum event length to return. Defaults to 1.
+
+        Returns:
+            dict: Dictionary of event start date arrays, grouped by trigger threshold.
+        """
+
+        start_dates = {k:self.event_starts[k][x>=length] for k,x in self.event_lengths.items()}
+        return start_dates
         
     def EventsBelowTriggerCount(self,length=1):
         """Returns count of events for each trigger threshold
@@ -183,8 +195,16 @@ class StorageLevelAssessment:
             dict: Dictionary of event counts, grouped by trigger threshold.
         """
         
-        output = {k:sum(i >= length for i in x) for k,x in self.events.items()}
+        output = {k:self._count_events_at_least(k,length) for k in self.triggers}
         return output
+
+    def _count_events_at_least(self,trigger,length):
+        """Returns count of events at least length long from the cached event length histogram."""
+
+        at_least = self._events_at_least[trigger]
+        if len(at_least)==0 or length<=0:
+            return len(self.event_lengths[trigger])
+        return int(at_least[length]) if length<len(at_least) else 0
     
     def EventsBelowTriggerMax(self):
         """Returns max event length for each trigger threshold
@@ -193,7 +213,7 @@ class StorageLevelAssessment:
             dict: Dictionary of event counts, grouped by trigger threshold.
         """
                 
-        output = {k:max(x) if len(x)>0 else np.nan for k,x in self.events.items()}
+        output = {k:int(x.max()) if len(x)>0 else np.nan for k,x in self.event_lengths.items()}
         return output
     
     def Summary(self,trigger=None):
@@ -206,23 +226,160 @@ class StorageLevelAssessment:
             df: Dataframe summary
         """
 
-        out_df = pd.DataFrame()
-        temp_numberyears=self.NumberWaterYearsBelow()
-        out_df['Column name']={trigger: self.columnname for trigger in self.triggers}
-        out_df['Start date']={trigger: self.start_date for trigger in self.triggers}
-        out_df['End date']={trigger: self.end_date for trigger in self.triggers}
-        out_df['Number water years with at least 1 day at or below level']=temp_numberyears
-        out_df['Percentage water years with at least 1 day at or below level']=self.PercentWaterYearsBelow(temp_numberyears)
-        out_df['Number of events at or below trigger (>=1day)']=self.EventsBelowTriggerCount()
-        out_df['Number of events at or below trigger (>=7days)']=self.EventsBelowTriggerCount(7)
-        out_df['Number of events at or below trigger (>=30days)']=self.EventsBelowTriggerCount(30)
-        out_df['Number of events at or below trigger (>=91days)']=self.EventsBelowTriggerCount(91)
-        out_df['Number of events at or below trigger (>=183days)']=self.EventsBelowTriggerCount(183)
-        out_df['Number of events at or below trigger (>=365days)']=self.EventsBelowTriggerCount(365)
-        out_df['Longest period at or below trigger (days)']=self.EventsBelowTriggerMax()
+        out_df = pd.DataFrame(index=self.triggers)
+        out_df['Column name']=self.columnname
+        out_df['Start date']=self.start_date
+        out_df['End date']=self.end_date
+        out_df['Number water years with at least 1 day at or below level']=[self._number_years[k] for k in self.triggers]
+        out_df['Percentage water years with at least 1 day at or below level']=[self._number_years[k]/self.wy_count for k in self.triggers]
+        for length in SUMMARY_EVENT_LENGTHS:
+            out_df[f'Number of events at or below trigger (>={length}day{"s" if length > 1 else ""})']=[self._count_events_at_least(k,length) for k in self.triggers]
+        out_df['Longest period at or below trigger (days)']=[len(self._events_at_least[k])-1 if len(self._events_at_least[k])>0 else np.nan for k in self.triggers]
 
         # If trigger is provided, subset those outputs
         if trigger==None:
             return out_df
         else:
             return out_df.loc[trigger]
+
+
+class EnsembleStorageLevelAssessment:
+
+    def __init__(self, df: Union[pd.DataFrame, utils.DataframeEnsemble], triggers: list, variable=None, wy_month=7, allow_part_years=False) -> None:
+        """Storage level assessment of every replicate of an ensemble at once.
+
+        Args:
+            df (pd.DataFrame | utils.DataframeEnsemble): Daily storage data with date as index and a column per replicate, or a DataframeEnsemble of replicates.
+            triggers (list): List of trigger thresholds to be assessed.
+            variable (str, optional): Storage column of the ensembled DataFrames. Required if df is a DataframeEnsemble. Defaults to None.
+            wy_month (int, optional): Water year start month. Defaults to 7.
+            allow_part_years (bool, optional): Allow part water years or only complete water years. Defaults to False.
+        """
+
+        if isinstance(df, utils.DataframeEnsemble):
+            if variable is None:
+                raise Exception("A storage variable must be provided for a DataframeEnsemble")
+            index, values = _ensemble_matrix(df, variable)
+            self.replicates = list(df.ensemble.keys())
+        elif isinstance(df, pd.DataFrame):
+            index, values = df.index, df.to_numpy(dtype=np.float64)
+            self.replicates = list(df.columns)
+        else:
+            raise Exception("Storage must be a DataFrame of replicates (columns) or a DataframeEnsemble")
+
+        self.triggers = triggers
+        self.wy_month = wy_month
+        self.allow_part_years = allow_part_years
+
+        # Calculate whether to include full WYs only
+        if not allow_part_years:
+            cropped = utils.crop_to_wy(pd.DataFrame(index=index), wy_month)
+            in_wy = index.isin(cropped.index)
+            index, values = cropped.index, values[in_wy]
+        self.index = index
+        self.start_date = index[0]
+        self.end_date = index[-1]
+
+        # Water years are contiguous blocks of days
+        wy = utils.get_wy(index, wy_month)
+        wy_starts = np.flatnonzero(np.r_[True, wy[1:] != wy[:-1]])
+        self.water_years = wy[wy_starts]
+        self.wy_count = len(wy_starts)
+
+        # Position of the last non-missing value on or before each day, used to
+        # carry the at/below state across missing values.
+        valid = ~np.isnan(values)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(values))[:, np.newaxis], -1), axis=0)
+        seen_valid = last_valid >= 0
+        last_valid = np.maximum(last_valid, 0)
+        replicate_idx = np.arange(values.shape[1])
+
+        # Run assessment for all replicates on init, one trigger at a time
+        self.annual_days_below = {}
+        self.events = {}
+        for trigger in triggers:
+            below = values <= trigger
+            self.annual_days_below[trigger] = np.add.reduceat(below, wy_starts, axis=0)
+            # Events: runs of days at or below trigger, where missing values
+            # neither count towards nor end an event
+            in_event = below[last_valid, replicate_idx] & seen_valid
+            edges = np.diff(np.pad(in_event.T.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+            event_replicates, starts = np.nonzero(edges == 1)
+            _, ends = np.nonzero(edges == -1)
+            days_below = np.vstack([np.zeros((1, values.shape[1]), dtype=np.int64), np.cumsum(below, axis=0)])
+            lengths = days_below[ends, event_replicates] - days_below[starts, event_replicates]
+            self.events[trigger] = (event_replicates, starts, lengths)
+
+    def AnnualDaysBelow(self):
+        """Returns the total days at or below trigger threshold by WY for each replicate.
+
+        Returns:
+            df: Tidy DataFrame with columns Replicate, Trigger, Water year and Days below.
+        """
+
+        out = []
+        for trigger, annual in self.annual_days_below.items():
+            out.append(pd.DataFrame({
+                "Replicate": np.tile(self.replicates, len(self.water_years)),
+                "Trigger": trigger,
+                "Water year": np.repeat(self.water_years, len(self.replicates)),
+                "Days below": annual.ravel()}))
+        return pd.concat(out, ignore_index=True)
+
+    def EventsBelowTrigger(self):
+        """Returns every event at or below each trigger threshold for each replicate.
+
+        Returns:
+            df: Tidy DataFrame with columns Replicate, Trigger, Start date and Length.
+        """
+
+        out = []
+        for trigger, (event_replicates, starts, lengths) in self.events.items():
+            out.append(pd.DataFrame({
+                "Replicate": np.asarray(self.replicates, dtype=object)[event_replicates],
+                "Trigger": trigger,
+                "Start date": self.index[starts],
+                "Length": lengths}))
+        return pd.concat(out, ignore_index=True)
+
+    def Summary(self):
+        """Returns table summary of key storage level assessment outputs for each replicate, as per StorageLevelAssessment.Summary.
+
+        Returns:
+            df: Dataframe summary indexed by Replicate and Trigger.
+        """
+
+        n_replicates = len(self.replicates)
+        out = []
+        for trigger in self.triggers:
+            numberyears = np.count_nonzero(self.annual_days_below[trigger] > 0, axis=0)
+            event_replicates, _, lengths = self.events[trigger]
+            trigger_df = pd.DataFrame(index=pd.MultiIndex.from_product([self.replicates, [trigger]], names=["Replicate", "Trigger"]))
+            trigger_df['Number water years with at least 1 day at or below level'] = numberyears
+            trigger_df['Percentage water years with at least 1 day at or below level'] = numberyears / self.wy_count
+            for length in SUMMARY_EVENT_LENGTHS:
+                trigger_df[f'Number of events at or below trigger (>={length}day{"s" if length > 1 else ""})'] = \
+                    np.bincount(event_replicates[lengths >= length], minlength=n_replicates)
+            longest = np.zeros(n_replicates)
+            np.maximum.at(longest, event_replicates, lengths)
+            trigger_df['Longest period at or below trigger (days)'] = np.where(np.bincount(event_replicates, minlength=n_replicates) > 0, longest, np.nan)
+            out.append(trigger_df)
+        return pd.concat(out).sort_index(level="Replicate", sort_remaining=False)
+
+    def SummaryPercentiles(self, percentiles=[5, 50, 95]):
+        """Returns percentiles across replicates of the Summary outputs.
+
+        Args:
+            percentiles (list, optional): List of percentiles (0 - 100). Defaults to [5, 50, 95].
+
+        Returns:
+            df: Dataframe indexed by Trigger and Percentile.
+        """
+
+        summary = self.Summary()
+        out = []
+        for trigger in self.triggers:
+            values = summary.xs(trigger, level="Trigger").to_numpy(dtype=np.float64)
+            out.append(pd.DataFrame(np.nanpercentile(values, percentiles, axis=0), columns=summary.columns,
+                                    index=pd.MultiIndex.from_product([[trigger], percentiles], names=["Trigger", "Percentile"])))
+        return pd.concat(out)
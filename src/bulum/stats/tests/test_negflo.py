@@ -1,10 +1,13 @@
 import logging
+import os
+import tempfile
 import unittest
 
 import numpy as np
 import pandas as pd
 
-from bulum.stats import Negflo
+from bulum import utils
+from bulum.stats import IncrementalForwardSmoother, Negflo, annual_mean, run_negflo_pairs
 
 logging.getLogger().setLevel(logging.CRITICAL)  # ignores warnings for carried negative flow
 
@@ -126,6 +129,93 @@ class Tests(unittest.TestCase):
         negflo.sm5()
         self.assertTrue(all(expect == negflo.df_residual["a"]))
 
+    def test_sm2_mass_balance(self):
+        """Tests on a longer series that the forward smoothing conserves volume
+        less any unresolved negative flow."""
+        rng = np.random.default_rng(42)
+        df = pd.DataFrame({
+            "a": rng.gamma(0.3, 20, 5000) - rng.gamma(0.5, 3, 5000),
+        })
+        negflo = Negflo(df.copy(), 2.0)
+        negflo.sm2()
+        s = negflo.df_residual["a"]
+        self.assertEqual(0, np.count_nonzero(s < 0))
+        self.assertTrue(all(s[df["a"] >= 2.0] >= 2.0))
+        self.assertAlmostEqual(s.sum(), df["a"].sum() - negflo.neg_residual)
+
+    def test_run_all(self):
+        df = pd.DataFrame({
+            "a": [-4.0, 1.0, 1.0, -1.0, 8.0, 0.0],
+            "b": [-1.0, 0.0, 3.0, -2.0, 4.0, -1.0],
+        })
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results = Negflo(df, 2.0).run_all(os.path.join(tmpdir, "residual"), single_file=True)
+            archive = np.load(os.path.join(tmpdir, "residual.npz"))
+            self.assertTrue(np.array_equal(archive["sm4"], results["sm4"].to_numpy()))
+        self.assertListEqual(list(results.keys()), ["rw1", "cl1", "sm1", "sm2", "sm3", "sm4", "sm5"])
+        self.assertTrue(results["rw1"].equals(df))
+        for method in ["cl1", "sm1", "sm2", "sm3", "sm4", "sm5"]:
+            negflo = Negflo(df.copy(), 2.0)
+            getattr(negflo, method)()
+            self.assertTrue(negflo.df_residual.equals(results[method]), method)
+
+    def test_neg_residuals(self):
+        df = pd.DataFrame({
+            "a": [-4.0, 1.0, 1.0, -1.0, 8.0, 0.0],
+            "b": [-10.0, 3.0, 3.0, 0.0, 0.0, 0.0],
+        })
+        negflo = Negflo(df, 2.0)
+        negflo.sm2()
+        self.assertDictEqual({"a": 0, "b": -8.0}, negflo.neg_residuals)
+
+    def test_run_negflo_pairs(self):
+        rng = np.random.default_rng(7)
+        index = pd.Index([f"2000-01-{d:02d}" for d in range(1, 31)], name="Date")
+        pairs = {f"gauge{i}": (pd.Series(rng.gamma(1, 5, 30), index=index),
+                               pd.Series(rng.gamma(1, 4, 30), index=index)) for i in range(3)}
+        results, remainders = run_negflo_pairs(pairs, 1.0, max_workers=2)
+        self.assertListEqual(list(results["sm2"].columns), ["gauge0", "gauge1", "gauge2"])
+        self.assertListEqual(list(remainders.index), ["gauge0", "gauge1", "gauge2"])
+        for key, (observed, modelled) in pairs.items():
+            negflo = Negflo(pd.DataFrame({key: observed - modelled}), 1.0)
+            negflo.sm4()
+            self.assertTrue(negflo.df_residual[key].equals(results["sm4"][key]))
+            self.assertEqual(negflo.neg_residuals[key], remainders.loc[key, "sm4"])
+
+    def test_sweep_flow_limits(self):
+        rng = np.random.default_rng(3)
+        index = pd.Index(utils.get_dates("2000-07-01", days=3 * 365 + 1), name="Date")
+        df = pd.DataFrame({"a": rng.gamma(0.5, 10, len(index)) - rng.gamma(0.5, 4, len(index))}, index=index)
+        sweep = Negflo(df, 0).sweep_flow_limits([0, 2.5])
+        self.assertEqual(len(sweep), 10)
+        for flow_limit in [0, 2.5]:
+            for method in ["sm1", "sm2", "sm3", "sm4", "sm5"]:
+                negflo = Negflo(df.copy(), flow_limit)
+                getattr(negflo, method)()
+                summary = sweep.loc[("a", flow_limit, method)]
+                self.assertAlmostEqual(summary["Mean annual flow"], annual_mean(negflo.df_residual)["a"])
+                self.assertEqual(summary["Remaining negative flow"], negflo.neg_residuals["a"])
+                self.assertEqual(summary["Modified days"], np.count_nonzero(negflo.df_residual["a"] != df["a"]))
+        for allow_part_years in [False, True]:
+            self.assertRaises(ValueError, Negflo(df.reset_index(drop=True), 0).sweep_flow_limits, [0, 2.5],
+                              allow_part_years=allow_part_years)
+
+    def test_incremental_forward_smoother(self):
+        """Tests that smoothing appended data matches a full rerun."""
+        df = pd.DataFrame({
+            "a": [-4.0, 1.0, 3.0, 5.0, np.nan, -1.0, 8.0, 9.0, 0.0, -2.0, 4.0, 3.0],
+        })
+        for method, carry_negative in [("sm2", True), ("sm3", False)]:
+            negflo = Negflo(df.copy(), 2.0)
+            getattr(negflo, method)()
+            smoother = IncrementalForwardSmoother(2.0, carry_negative=carry_negative)
+            smoothed = smoother.update(df["a"].iloc[:4])
+            for start, end in [(4, 7), (7, 8), (8, 12)]:
+                tail = smoother.update(df["a"].iloc[start:end])
+                smoothed = pd.concat([smoothed.drop(tail.index, errors="ignore"), tail])
+            self.assertTrue(negflo.df_residual["a"].equals(smoothed), method)
+            self.assertEqual(negflo.neg_residuals["a"], smoother.neg_residual)
+
     # TODO implement and write tests for sm6
 
     # TODO write tests for sm7, see 4 (or more!) cases
@@ -50,6 +50,36 @@ class Tests(unittest.TestCase):
         answer_complete_wy = osta.annual_median(df,7)["Functions\\Functions\\Functions\\Functions@Results@ODH_RWA@$f_KurandaTWS (ML.day^-1)"]
         self.assertAlmostEqual(answer_complete_wy,457.233468094998)
 
+    def test_annual_summary(self):
+        df = io.read_ts_csv("./src/bulum/stats/tests/test_div_data.csv",r"%Y-%m-%d")
+        summary = osta.annual_summary(df, ["max", "min", "mean", "median", 10, 90], 7)
+        self.assertListEqual(list(summary.index), ["max", "min", "mean", "median", 10, 90])
+        pd.testing.assert_series_equal(summary.loc["max"], osta.annual_max(df, 7), check_names=False)
+        pd.testing.assert_series_equal(summary.loc["min"], osta.annual_min(df, 7), check_names=False)
+        pd.testing.assert_series_equal(summary.loc["mean"], osta.annual_mean(df, 7), check_names=False)
+        pd.testing.assert_series_equal(summary.loc["median"], osta.annual_median(df, 7), check_names=False)
+        pd.testing.assert_frame_equal(summary.loc[[10, 90]], osta.annual_percentile(df, [10, 90], 7), check_index_type=False)
+        col = "Functions\\Functions\\Functions\\Functions@Results@ODH_RWA@$f_KurandaTWS (ML.day^-1)"
+        summary_series = osta.annual_summary(df[col], ["mean", 50], 7)
+        self.assertAlmostEqual(summary_series["mean"], 457.095643460864)
+        self.assertAlmostEqual(summary_series[50], 457.233468094998)
+
+    def test_datetime_index_mode(self):
+        df = io.read_ts_csv("./src/bulum/stats/tests/test_dem_sup_data_trunc.csv")
+        df_dt = io.read("./src/bulum/stats/tests/test_dem_sup_data_trunc.csv", datetime_index=True)
+        self.assertTrue(df_dt.has_datetime_index())
+        self.assertEqual(utils.check_df_format_standards(df_dt, allow_datetime_index=True), [])
+        pd.testing.assert_series_equal(osta.annual_mean(df_dt, 7), osta.annual_mean(df, 7))
+        pd.testing.assert_series_equal(osta.annual_max(df_dt, 7, True), osta.annual_max(df, 7, True))
+        supply_col = "Water User\\Irrigation_Demand(ODH)\\Demand Model\\Demand Model@Ordered Water Supplied (ML)"
+        demand = [263.5,238,263.5,255,0,0,0,0,0,0,255,263.5]
+        rel = osta.Reliability(demand, df[supply_col], demand_type="total", quiet=True)
+        rel_dt = osta.Reliability(demand, df_dt[supply_col], demand_type="total", quiet=True)
+        self.assertAlmostEqual(rel_dt.MonthlyReliability(.99), rel.MonthlyReliability(.99))
+        self.assertAlmostEqual(rel_dt.AnnualReliability(.99, 7), rel.AnnualReliability(.99, 7))
+        df_dt.to_string_index()
+        self.assertTrue(df_dt.index.equals(df.index))
+
     def test_monthly_reliability(self):
         # Test timeseries demand input
         df = io.read_ts_csv("./src/bulum/stats/tests/test_dem_sup_data_trunc.csv")
@@ -150,6 +180,42 @@ class Tests(unittest.TestCase):
         answer_complete_years_annual_constant = temp_annual_constant.AnnualReliability(0.95,7)
         self.assertAlmostEqual(answer_complete_years_annual_constant,0.584745763)
 
+    def test_reliability_demand_disaggregation(self):
+        supply = pd.Series(1.0, index=utils.get_date_strings("1999-07-01", 731))
+        temp = osta.Reliability(290.0, supply, demand_timescale="monthly", quiet=True)
+        demand_ts = temp.ReliabilityTS(7)
+        self.assertEqual(demand_ts["2000-02-15"], 10.0)
+        self.assertAlmostEqual(demand_ts["2001-02-15"], 290.0/28)
+        demand_ts[:] = 0
+        self.assertEqual(temp.ReliabilityTS(7)["2000-02-15"], 10.0)
+
+        temp = osta.Reliability(3660.0, supply, demand_timescale="yearly", quiet=True)
+        self.assertEqual(temp.ReliabilityTS(7)["1999-07-01"], 10.0)
+        self.assertEqual(temp.ReliabilityTS(1)["1999-07-01"], 3660.0/365)
+
+    def test_reliability_surface(self):
+        df = io.read_ts_csv("./src/bulum/stats/tests/test_dem_sup_data_trunc.csv")
+        supply = df["Water User\\Irrigation_Demand(ODH)\\Demand Model\\Demand Model@Ordered Water Supplied (ML)"]
+        supplies = pd.DataFrame({"Rep0": supply, "Rep1": supply * 0.9})
+        demands = [5, 8.5, [8.5,8.5,8.5,8.5,0,0,0,0,0,0,8.5,8.5]]
+        tolerances = [0.9, 0.99, 1]
+
+        monthly = osta.reliability_surface(demands, supplies, tolerances, timescale="monthly")
+        annual = osta.reliability_surface(demands, supplies, tolerances, timescale="annual", demand_type="daily_constant")
+        self.assertListEqual(list(monthly.index.get_level_values("Demand").unique()), [0, 1, 2])
+        np.testing.assert_array_equal(monthly.index.get_level_values("Demand value").unique(), [5, 8.5, np.nan])
+        monthly = monthly.droplevel("Demand value")
+        annual = annual.droplevel("Demand value")
+        for i, demand in enumerate(demands):
+            for rep in supplies.columns:
+                for tol in tolerances:
+                    self.assertEqual(monthly.loc[(i, tol), rep], osta.Reliability(demand, supplies[rep], quiet=True).MonthlyReliability(tol))
+                    self.assertEqual(annual.loc[(i, tol), rep], osta.Reliability(demand, supplies[rep], demand_type="daily_constant", quiet=True).AnnualReliability(tol))
+        # A scalar demand equal to the position of another demand gets its own rows
+        surface = osta.reliability_surface([2, 5, [3.0]*12], supply, [1], timescale="monthly")
+        self.assertEqual(len(surface), 3)
+        self.assertTrue(surface.index.is_unique)
+
     def test_storage_level_assessment(self):
         ## Checking answers against "GB_RCP45_2050_02b_StormKingDam.in" outputs in 26009
         
@@ -183,6 +249,36 @@ class Tests(unittest.TestCase):
         read_summary=pd.read_csv("./src/bulum/stats/tests/test_storage_data_summary_answers.csv",index_col=0)
         pd.testing.assert_frame_equal(answer_summary,read_summary,check_dtype=False,check_index_type=False,check_column_type=False)
 
+    def test_storage_level_assessment_event_dates(self):
+        df = io.read_ts_csv("./src/bulum/stats/tests/test_storage_data.csv")
+        sla = osta.StorageLevelAssessment(df[r"Storage\0013 Storm King Dam\Storage Volume (ML)"],[400,655])
+        start_dates = sla.EventsBelowTriggerStartDates(100)
+        self.assertEqual(len(start_dates[655]),len(sla.EventsBelowTrigger(100)[655]))
+        self.assertEqual(start_dates[655][0],"1902-12-29")
+        self.assertListEqual(sla.EventsBelowTriggerAlgorithm(400),[75,4,64,103,9,289])
+
+    def test_ensemble_storage_level_assessment(self):
+        df = io.read_ts_csv("./src/bulum/stats/tests/test_storage_data.csv")
+        storage = df[r"Storage\0013 Storm King Dam\Storage Volume (ML)"].to_numpy()
+        replicates = pd.DataFrame({f"Rep{i}": np.roll(storage, 3000 * i) for i in range(3)}, index=df.index)
+        replicates.iloc[100:140, 1] = np.nan
+        triggers = [400, 655, 1090, 1530]
+        esla = osta.EnsembleStorageLevelAssessment(replicates, triggers)
+
+        # Each replicate matches the single replicate assessment
+        summary = esla.Summary()
+        for rep in replicates.columns:
+            sla = osta.StorageLevelAssessment(replicates[rep], triggers)
+            expected = sla.Summary().drop(columns=['Column name', 'Start date', 'End date'])
+            pd.testing.assert_frame_equal(summary.xs(rep, level="Replicate"), expected, check_dtype=False, check_index_type=False, check_names=False)
+        self.assertEqual(summary.loc[("Rep0", 655), 'Longest period at or below trigger (days)'], 411)
+
+        annual = esla.AnnualDaysBelow()
+        self.assertEqual(len(annual), len(triggers) * len(replicates.columns) * esla.wy_count)
+
+        percentiles = esla.SummaryPercentiles([0, 100])
+        self.assertEqual(percentiles.loc[(1530, 100), 'Longest period at or below trigger (days)'], summary['Longest period at or below trigger (days)'].xs(1530, level="Trigger").max())
+
     def test_StochasticDataComparison(self):
         ## Checking answers against PPT Historical outputs in Checking_LF_B.xlsm in 10010
         
@@ -236,6 +332,18 @@ class Tests(unittest.TestCase):
         self.assertEqual(osta.cumulative_risk(input=ensemble,variable="Storage",parameters=[64000]).__len__(),1)
         self.assertEqual(osta.cumulative_risk(input=ensemble.filter_tag("scen1"),variable="Storage",parameters=64000).__len__(),1)
 
+    def test_cumulative_risk_hand_computed(self):
+        # Replicate 1 has a missing value, replicate 2 only ever equals (never goes below)
+        # the threshold, and replicates 0 and 3 first go below it on the same day
+        dates = utils.get_date_strings("2000-01-01", 5)
+        ensemble = utils.DataframeEnsemble()
+        for storage in [[12, 9, 11, 8, 15], [11, np.nan, 9, 12, 10], [20, 10, 15, 13, 12], [13, 9, 14, 9, 9]]:
+            ensemble.add_dataframe(pd.DataFrame({"Storage": storage}, index=pd.Index(dates, name="Date"), dtype=float))
+        answer = osta.cumulative_risk(input=ensemble, variable="Storage", parameters=[10, 0])
+        self.assertListEqual(answer["10"].tolist(), [0, 50, 75, 75, 75])
+        self.assertListEqual(answer["0"].tolist(), [0, 0, 0, 0, 0])
+        self.assertListEqual(answer["10"].index.tolist(), dates)
+
     def test_incremental_risk(self):
         ensemble = utils.DataframeEnsemble()
         for filename in ["./src/bulum/stats/tests/scenario_replicates/test_scen1_repl1.csv",
@@ -268,6 +376,33 @@ class Tests(unittest.TestCase):
         self.assertAlmostEqual(osta.percentile_envelope(input=ensemble.filter_tag("scen1"),variable="Storage",parameters=[0,10,25,50])["10"].mean(),130487.5073260038)
         self.assertEqual(osta.percentile_envelope(input=ensemble,variable="Storage",parameters=[10]).__len__(),1)
         self.assertEqual(osta.percentile_envelope(input=ensemble.filter_tag("scen1"),variable="Storage",parameters=10).__len__(),1)
+
+    def test_incremental_risk_and_envelope_hand_computed(self):
+        # Values equal to the threshold are not below it, and a missing value is not below
+        # it either; percentiles on a day with a missing value are NaN
+        dates = utils.get_date_strings("2000-01-01", 5)
+        ensemble = utils.DataframeEnsemble()
+        for storage in [[12, 9, 11, 8, 15], [11, np.nan, 9, 12, 10], [20, 10, 15, 13, 12], [13, 9, 14, 9, 9]]:
+            ensemble.add_dataframe(pd.DataFrame({"Storage": storage}, index=pd.Index(dates, name="Date"), dtype=float))
+        risk = osta.incremental_risk(input=ensemble, variable="Storage", parameters=[10])
+        self.assertListEqual(risk["10"].tolist(), [0, 50, 25, 50, 25])
+        envelope = osta.percentile_envelope(input=ensemble, variable="Storage", parameters=[0, 50, 100])
+        np.testing.assert_array_equal(envelope["0"].to_numpy(), [11, np.nan, 9, 8, 9])
+        np.testing.assert_array_equal(envelope["50"].to_numpy(), [12.5, np.nan, 12.5, 10.5, 11])
+        np.testing.assert_array_equal(envelope["100"].to_numpy(), [20, np.nan, 15, 13, 15])
+
+    def test_risk_after_member_modified(self):
+        ensemble = utils.DataframeEnsemble()
+        for filename in ["./src/bulum/stats/tests/scenario_replicates/test_scen1_repl1.csv",
+                         "./src/bulum/stats/tests/scenario_replicates/test_scen1_repl2.csv"]:
+            ensemble.add_dataframe(io.read(filename), tag="scen1")
+        before = osta.incremental_risk(input=ensemble, variable="Storage", parameters=[64000])["64000"]
+        ensemble.get(0)["Storage"] = 0.0
+        after = osta.incremental_risk(input=ensemble, variable="Storage", parameters=[64000])["64000"]
+        self.assertTrue((after >= 50).all())
+        self.assertGreater(after.mean(), before.mean())
+        self.assertListEqual(osta.cumulative_risk(input=ensemble, variable="Storage", parameters=[64000])["64000"].tolist(),
+                             [50 + (ensemble.get(1)["Storage"] < 64000).cummax().iloc[i] * 50 for i in range(len(after))])
         
 
 if __name__ == '__main__':
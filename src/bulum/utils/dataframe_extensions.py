@@ -16,8 +16,11 @@ import enum
 import re
 from typing import Any, Iterable, Optional
 
+import numpy as np
 import pandas as pd
 
+from .datetime_functions import DateCalendar, get_calendar
+
 # import bulum.io as oio
 
 
@@ -159,13 +162,68 @@ class TimeseriesDataframe(pd.DataFrame):
     def count_tags(self):
         return len(self.tags.split(self.TAG_DELIMITER))
 
+    @property
+    def calendar(self) -> DateCalendar:
+        """Calendar arrays (year, month, day, day_of_year, and water years via
+        calendar.wy(wy_month)) for the index. Computed on first use and cached
+        for the life of the index."""
+        return get_calendar(self.index)
+
+    def has_datetime_index(self) -> bool:
+        """Check if the TimeseriesDataframe is in datetime index mode."""
+        return isinstance(self.index, pd.DatetimeIndex)
+
+    def to_datetime_index(self):
+        """Switch the TimeseriesDataframe to datetime index mode (in place).
+
+        The "%Y-%m-%d" string index is replaced by a pd.DatetimeIndex named
+        "Date". bulum.utils and bulum.stats functions accept either index type,
+        but in datetime mode they avoid parsing and slicing date strings, which
+        is considerably faster for large dataframes and ensembles. Use
+        to_string_index() to switch back, e.g. before comparing with string
+        indexed dataframes. Writers in bulum.io convert back to strings as
+        required.
+
+        Returns:
+            TimeseriesDataframe: self, to allow chaining.
+        """
+        if not self.has_datetime_index():
+            np_dates = np.asarray(self.index, dtype=object).astype('datetime64[D]')
+            self.index = pd.DatetimeIndex(np_dates.astype('datetime64[s]'), name="Date")
+        return self
+
+    def to_string_index(self):
+        """Switch the TimeseriesDataframe back to the standard "%Y-%m-%d" string
+        index (in place).
+
+        Returns:
+            TimeseriesDataframe: self, to allow chaining.
+        """
+        if self.has_datetime_index():
+            np_dates = np.asarray(self.index, dtype='datetime64[D]')
+            self.index = pd.Index(np.datetime_as_string(np_dates, unit='D').tolist(), name="Date")
+        return self
+
 
 class DataframeEnsemble:
     """A DataframeEnsemble is an collection of bulum-style timeseries
     dataframes, which might represent collected results from a set of model
     runs. Each timeseries dataframe is stored in an internal object, with a
     little attached metadata. All timeseries in the ensemble are expected to
-    have the same index, and the same columns."""
+    have the same index, and the same columns.
+
+    For numerical work across replicates, the ensemble also maintains a
+    columnar store: a contiguous float64 array holding every replicate, day
+    and variable. It is built on first use, after which the member dataframes
+    are views into it, so in-place edits to a member are seen by the store.
+    variable_matrix() and to_array() return read-only views of the store.
+    Before each use, every member is checked to still be backed by the store
+    (same index, columns and data buffer); if a member has been detached,
+    e.g. by assigning a whole column, or dataframes have been added, the
+    store is rebuilt from the current member values. The store is only used
+    when all members share the same index and columns, and are entirely
+    float64.
+    """
 
     def __init__(self, dfs: Optional[Iterable[TimeseriesDataframe]] = None) -> None:
         """
@@ -173,6 +231,10 @@ class DataframeEnsemble:
             dfs: A collection of dataframes to add to the ensemble.
         """
         self.ensemble: dict[Any, TimeseriesDataframe] = {}
+        # Columnar store of shape (replicate x variable x day), and the rows of
+        # it backing each member (a slice or an array of positions)
+        self._store: Optional[np.ndarray] = None
+        self._store_rows = None
         if dfs is not None:
             for df in dfs:
                 self.add_dataframe(df)
@@ -211,6 +273,7 @@ class DataframeEnsemble:
             while key in self.ensemble:
                 key += 1
         self.ensemble[key] = df
+        self._store = None
 
 #    def add_dataframe_from_file(self, filename, key=None, tag=None):
 #        df = TimeseriesDataframe.from_file(filename)
@@ -240,6 +303,15 @@ class DataframeEnsemble:
                     f" but the ensemble members have shape {first_shape}!"
                 )
 
+    def tag_mask(self, tag, *, exclude: bool = False, **kwargs) -> np.ndarray:
+        """Return a boolean mask over the ensemble members (in insertion
+        order, i.e. the replicate axis of variable_matrix()) of dataframes matching
+        the tag. Arguments are as for filter_tag().
+        """
+        # Take the logical XOR
+        return np.array([tsdf.has_tag(tag, **kwargs) != exclude
+                         for tsdf in self.ensemble.values()], dtype=bool)
+
     def filter_tag(self, tag, *, exclude: bool = False, **kwargs):
         """Return a new ensemble containing dataframes filtered by tag.
 
@@ -256,13 +328,113 @@ class DataframeEnsemble:
             exclude
                 If True, it will filter *out* all dataframes which match the tag.
         """
+        mask = self.tag_mask(tag, exclude=exclude, **kwargs)
         subensemble = DataframeEnsemble()
-        for key, tsdf in self.ensemble.items():
-            # Take the logical XOR
-            if tsdf.has_tag(tag, **kwargs) != exclude:
-                subensemble.add_dataframe(tsdf, key)
+        subensemble.ensemble = {key: tsdf for (key, tsdf), keep
+                                in zip(self.ensemble.items(), mask) if keep}
+        if self._store is not None:
+            # Share the columnar store rather than building another
+            rows = np.arange(self._store.shape[0])[self._store_rows][mask]
+            if len(rows) > 0 and np.all(np.diff(rows) == 1):
+                rows = slice(rows[0], rows[-1] + 1)
+            subensemble._store = self._store
+            subensemble._store_rows = rows
         return subensemble
 
+    def is_aligned(self) -> bool:
+        """Check if all dataframes in the (non-empty) ensemble share the same
+        index and columns, which is required by to_array()."""
+        dfs = list(self.ensemble.values())
+        return len(dfs) > 0 and all(
+            (df.index is dfs[0].index or df.index.equals(dfs[0].index))
+            and (df.columns is dfs[0].columns or df.columns.equals(dfs[0].columns))
+            for df in dfs[1:])
+
+    def _store_is_current(self) -> bool:
+        """Internal function to check that every member is still a view into
+        the columnar store, so that the store holds their current values."""
+        if self._store is None:
+            return False
+        dfs = list(self.ensemble.values())
+        rows = np.arange(self._store.shape[0])[self._store_rows]
+        if len(rows) != len(dfs):
+            return False
+        index, columns = dfs[0].index, dfs[0].columns
+        for df, row in zip(dfs, rows):
+            if df.index is not index or df.columns is not columns:
+                return False
+            values = df.to_numpy()
+            if (values.shape != self._store.shape[:0:-1] or values.__array_interface__["data"][0]
+                    != self._store[row].__array_interface__["data"][0]):
+                return False
+        return True
+
+    def _ensure_store(self) -> bool:
+        """Internal function to (re)build the columnar store if it is missing or
+        stale. Returns False if the ensemble cannot be stored (see class
+        docstring)."""
+        if self._store_is_current():
+            return True
+        dfs = list(self.ensemble.values())
+        if not self.is_aligned() or not all((df.dtypes == np.float64).all() for df in dfs):
+            self._store = None
+            return False
+        index, columns = dfs[0].index, dfs[0].columns
+        store = np.empty((len(dfs), len(columns), len(index)), dtype=np.float64)
+        for i, df in enumerate(dfs):
+            store[i] = df.to_numpy().T
+        # Make each member a view into its row of the store
+        for i, df in enumerate(dfs):
+            pd.DataFrame.__init__(df, pd.DataFrame(store[i].T, index=index, columns=columns, copy=False), copy=False)
+        self._store = store
+        self._store_rows = slice(0, len(dfs))
+        return True
+
+    @property
+    def index(self) -> pd.Index:
+        """The index shared by the dataframes in the ensemble."""
+        return next(iter(self.ensemble.values())).index
+
+    @property
+    def columns(self) -> pd.Index:
+        """The columns shared by the dataframes in the ensemble."""
+        return next(iter(self.ensemble.values())).columns
+
+    def to_array(self) -> np.ndarray:
+        """Return a float64 array of shape (replicate x day x variable) holding
+        all columns of the ensemble. This is a read-only view of the columnar
+        store where possible (a copy for non-contiguous tag selections), and a
+        copy of the member dataframes otherwise.
+
+        Raises:
+            ValueError: If the ensemble is empty, its dataframes do not share
+                the same index and columns, or a column is not numeric.
+        """
+        if self._ensure_store():
+            values = self._store[self._store_rows].transpose(0, 2, 1)
+            values.flags.writeable = False
+            return values
+        if not self.is_aligned():
+            raise ValueError("ERROR: to_array() requires a non-empty ensemble"
+                             " with the same index and columns in all dataframes!")
+        return np.stack([df.to_numpy(dtype='float64') for df in self.ensemble.values()])
+
+    def variable_matrix(self, variable) -> np.ndarray:
+        """Return a (day x replicate) float64 array of a variable across the
+        ensemble. This is a read-only view of the columnar store where possible
+        (a copy of the one variable for non-contiguous tag selections), and is
+        gathered from the member dataframes otherwise.
+
+        Args:
+            variable: Column of interest in the ensembled dataframes.
+        """
+        if self._ensure_store():
+            values = self._store[self._store_rows, self.columns.get_loc(variable)].T
+            values.flags.writeable = False
+            return values
+        return np.column_stack([df[variable].to_numpy(dtype='float64')
+                                for df in self.ensemble.values()])
+
     def add_tag(self, tag):
         """Add a tag to all dataframes."""
         for dataframe in self.ensemble.values():
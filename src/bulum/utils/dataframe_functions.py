@@ -1,8 +1,15 @@
+import weakref
+import numpy as np
 import pandas as pd
 from bulum import utils
 from pandas.api.types import is_datetime64_any_dtype as is_datetime
 from datetime import datetime
 
+# Date indexes which have already passed the sequential-date check, keyed by
+# id(index). Indexes are immutable so the result can be reused until the index
+# is garbage collected (the weakref callback then removes the entry).
+_validated_date_indexes: dict[int, weakref.ref] = {}
+
 
 def find_col(df: pd.DataFrame, string_pattern: str, unique_match=True):
     """
@@ -31,12 +38,13 @@ def assert_df_has_one_column(df: pd.DataFrame):
         raise Exception(f"The dataframe must have exactly 1 column, but {n_cols} were found.") 
     
 
-def assert_df_format_standards(df: pd.DataFrame):
+def assert_df_format_standards(df: pd.DataFrame, allow_datetime_index=False):
     """
     Args:
         df (pd.DataFrame): _description_
+        allow_datetime_index (bool, optional): Also accept a daily sequential pd.DatetimeIndex. Defaults to False.
     """
-    violations = check_df_format_standards(df)
+    violations = check_df_format_standards(df, allow_datetime_index=allow_datetime_index)
     if len(violations) > 0:
         raise Exception(f"Dataframe does not meet bulum format standards.\n {violations[0]}")
     
@@ -44,13 +52,16 @@ def assert_df_format_standards(df: pd.DataFrame):
 def crop_to_wy(df: pd.DataFrame, wy_month=7):
         start_date=utils.get_wy_start_date(df, wy_month)
         end_date=utils.get_wy_end_date(df, wy_month)
+        if is_datetime(df.index): #datetime index; compare as np.datetime64[D]
+            np_dates = utils.dates_to_np_datetimes64d(df.index)
+            return df.loc[(np_dates >= np.datetime64(start_date, 'D')) & (np_dates <= np.datetime64(end_date, 'D'))]
         if isinstance(start_date, datetime): #handle datetime inputs
             start_date = start_date.strftime(r"%Y-%m-%d")
             end_date = end_date.strftime(r"%Y-%m-%d")
         return df.loc[(df.index >= start_date) & (df.index <= end_date)]
         
 
-def check_df_format_standards(df: pd.DataFrame):
+def check_df_format_standards(df: pd.DataFrame, allow_datetime_index=False):
     """
     Checks if a given dataframe meets standards generally requried by 
     bulum functions. These standards include:
@@ -58,11 +69,13 @@ def check_df_format_standards(df: pd.DataFrame):
     - Dateframe is not empty
     - Dataframe index name is "Date"
     - Dataframe index values are daily sequential strings with the format "%Y-%m-%d"
+      (or, if allow_datetime_index is True, a daily sequential pd.DatetimeIndex)
     - Data columns all have datatype of double
     - Missing values are nan (not na, not -nan)
 
     Args:
         df (_type_): _description_
+        allow_datetime_index (bool, optional): Also accept a daily sequential pd.DatetimeIndex. Defaults to False.
 
     Returns:
         bool: _description_
@@ -74,7 +87,14 @@ def check_df_format_standards(df: pd.DataFrame):
     if df.index.name != "Date":
         return ["Dataframe index name is not 'Date'"]
     # - Dataframe index values are daily sequential strings with the format "%Y-%m-%d"
-    if len(df) > 0:
+    if len(df) > 0 and allow_datetime_index and isinstance(df.index, pd.DatetimeIndex):
+        # Check for sequential dates at midnight
+        if not _is_validated_date_index(df.index):
+            violation = _check_sequential_datetimes(df.index)
+            if violation is not None:
+                return [violation]
+            _set_validated_date_index(df.index)
+    elif len(df) > 0:
         # Check index values are strings
         if not isinstance(df.index[0], str):
             return [f"Index values are not strings: {type(df.index[0])}"]
@@ -83,11 +103,11 @@ def check_df_format_standards(df: pd.DataFrame):
         if str_format != r"%Y-%m-%d":
             return [f"Date string format should be '%Y-%m-%d' but is '{str_format}'"]
         # Check for sequential dates
-        start_datetime = datetime.strptime(df.index[0], str_format)
-        expected_date_strings = utils.get_dates(start_date=start_datetime, days=len(df), str_format=r"%Y-%m-%d")
-        for i in range(len(df)):
-            if df.index.values[i] != expected_date_strings[i]:
-                return [f"Expected date string '{expected_date_strings[i]}' but found '{df.index.values[i]}' at index {i}"]
+        if not _is_validated_date_index(df.index):
+            violation = _check_sequential_date_strings(df.index, str_format)
+            if violation is not None:
+                return [violation]
+            _set_validated_date_index(df.index)
     # - Data columns all have datatype of double
     for c in df.columns:
         data_type = df[c].dtypes
@@ -97,6 +117,70 @@ def check_df_format_standards(df: pd.DataFrame):
     return []
 
 
+def _is_validated_date_index(index: pd.Index) -> bool:
+    """Returns True if this exact index object has already passed _check_sequential_date_strings."""
+    ref = _validated_date_indexes.get(id(index))
+    return (ref is not None) and (ref() is index)
+
+
+def _set_validated_date_index(index: pd.Index) -> None:
+    """Remembers that this index object passed _check_sequential_date_strings."""
+    key = id(index)
+    try:
+        _validated_date_indexes[key] = weakref.ref(index, lambda _: _validated_date_indexes.pop(key, None))
+    except TypeError:
+        pass  # not weak-referenceable; simply don't cache
+
+
+def _check_sequential_date_strings(index: pd.Index, str_format=r"%Y-%m-%d"):
+    """
+    Checks that index values are daily sequential strings with the format
+    "%Y-%m-%d". The index is converted once to np.datetime64[D] and checked with
+    np.diff in a single vectorized pass; the first offending value is only
+    searched for if that check fails.
+
+    Returns:
+        str | None: Description of the first violation, or None if there are none.
+    """
+    values = np.asarray(index, dtype=object)
+    try:
+        np_dates = values.astype('datetime64[D]')
+        is_sequential = bool(np.all(np.diff(np_dates).astype(np.int64) == 1))
+        # Guard against strings numpy can parse but which are not "%Y-%m-%d", e.g. "2000-01-01T00"
+        is_sequential = is_sequential and bool(np.all(np.datetime_as_string(np_dates, unit='D') == values))
+    except (TypeError, ValueError):
+        is_sequential = False
+    if is_sequential:
+        return None
+    # Find the first offending value
+    start_datetime = datetime.strptime(values[0], str_format)
+    expected_date_strings = np.array(utils.get_date_strings(start_datetime, len(values)), dtype=object)
+    mismatches = np.flatnonzero(values != expected_date_strings)
+    if len(mismatches) == 0:
+        return None
+    i = int(mismatches[0])
+    return f"Expected date string '{expected_date_strings[i]}' but found '{values[i]}' at index {i}"
+
+
+def _check_sequential_datetimes(index: pd.DatetimeIndex):
+    """
+    Checks that a pd.DatetimeIndex is daily sequential with no time component.
+
+    Returns:
+        str | None: Description of the first violation, or None if there are none.
+    """
+    np_dates = utils.dates_to_np_datetimes64d(index)
+    has_time = np.asarray(index.normalize() != index)
+    if np.any(has_time):
+        i = int(np.flatnonzero(has_time)[0])
+        return f"Expected a date without time but found '{index[i]}' at index {i}"
+    steps = np.diff(np_dates).astype(np.int64)
+    if np.all(steps == 1):
+        return None
+    i = int(np.flatnonzero(steps != 1)[0]) + 1
+    return f"Expected date '{np_dates[i - 1] + 1}' but found '{np_dates[i]}' at index {i}"
+
+
 def set_index_dt(df: pd.DataFrame, dt_values=None, start_dt=None, **kwargs):
     """
     Returns a dataframe with datetime index. Useful for converting bulum dataframes to datetime
@@ -166,6 +250,13 @@ def datetimes_to_strings(v, str_format: str=r"%Y-%m-%d", **kwargs):
     Returns:
         _type_: _description_
     """
+    is_tz_aware = (getattr(v, "tz", None) is not None) or (len(v) > 0 and getattr(v[0], "tzinfo", None) is not None)
+    if (str_format == r"%Y-%m-%d") and not is_tz_aware:
+        # Bulk formatting for the bulum standard string format
+        try:
+            return np.datetime_as_string(np.asarray(v, dtype='datetime64[D]'), unit='D').tolist()
+        except (TypeError, ValueError):
+            pass
     answer = [d.strftime(str_format) for d in v]
     return answer
 
@@ -228,7 +319,7 @@ def convert_index_to_string(df: pd.DataFrame, str_format: str=r"%Y-%m-%d", **kwa
         pass
     elif is_datetime(df.index):
         # Try to convert datetimes to strings.
-        new_index_values = [d.strftime(str_format) for d in df.index]
+        new_index_values = datetimes_to_strings(df.index, str_format)
         df.index = new_index_values
     else:
         raise Exception("The index is not strings or datetimes.")
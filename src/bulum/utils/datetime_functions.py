@@ -1,4 +1,6 @@
+import weakref
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 
@@ -25,27 +27,152 @@ def standardize_datestring_format(values):
     """
     date_fmt = get_date_format(values[0])
     np_dates = to_np_datetimes64d(values, date_fmt=date_fmt)
-    # start_date = datetime.strptime(values[0], date_fmt) #dateutil.parser.parse(values[0], format=fmt)
-    # end_date = datetime.strptime(values[-1], date_fmt) + timedelta(days=1)
-    # np_datetimes64s = np.arange(start_date, end_date, dtype='datetime64[D]')
-    # if (len(np_datetimes64s) != len(values)):
-    #     raise Exception(f"ERROR: Expected {len(np_datetimes64s)} dates between {start_date} and {end_date} but found {len(values)}.")
-    answer = [str(t) for t in np_dates]
+    answer = get_date_strings(np_dates[0], len(np_dates))
     return answer
 
 
 def to_np_datetimes64d(values, date_fmt=r'%Y-%m-%d'):
+    """
+    Converts a list of consecutive daily date strings into a (read-only) array of
+    np.datetime64[D]. Only the first and last values are parsed.
+    """
     start_date = datetime.strptime(values[0], date_fmt)
     end_date = datetime.strptime(values[-1], date_fmt) + timedelta(days=1)
-    np_dates = np.arange(start_date, end_date, dtype='datetime64[D]') #Assumes the dates are consecutive!
+    np_dates = get_np_dates(start_date, (end_date - start_date).days) #Assumes the dates are consecutive!
     if (len(np_dates) != len(values)):
         raise Exception(f"ERROR: Expected {len(np_dates)} dates between {start_date} and {end_date} but found {len(values)}.")
     return np_dates
 
 
+def dates_to_np_datetimes64d(dates) -> np.ndarray:
+    """
+    Converts dates into an array of np.datetime64[D] in one vectorized pass. Accepts
+    "%Y-%m-%d" strings (e.g. a bulum string index), datetimes, np.datetime64 values
+    or a pd.DatetimeIndex. Unlike to_np_datetimes64d, the dates need not be
+    consecutive. Times of day are truncated.
+    """
+    if isinstance(dates, pd.DatetimeIndex):
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        return np.asarray(dates, dtype='datetime64[D]')
+    values = np.asarray(dates)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[D]')
+    if len(values) > 0 and isinstance(values[0], pd.Timestamp):
+        return dates_to_np_datetimes64d(pd.DatetimeIndex(values))
+    return values.astype(object).astype('datetime64[D]')
+
+
+@lru_cache(maxsize=32)
+def _cached_np_dates(start: np.datetime64, days: int) -> np.ndarray:
+    np_dates = np.arange(start, start + days, dtype='datetime64[D]')
+    np_dates.flags.writeable = False
+    return np_dates
+
+
+@lru_cache(maxsize=32)
+def _cached_date_strings(start: np.datetime64, days: int) -> tuple:
+    return tuple(np.datetime_as_string(_cached_np_dates(start, days), unit='D').tolist())
+
+
+def get_np_dates(start_date, days: int) -> np.ndarray:
+    """
+    Returns a read-only array of consecutive daily np.datetime64[D] values. Results
+    are cached by (start_date, days), so repeated calls are essentially free.
+
+    Args:
+        start_date (datetime | np.datetime64 | str): First date. Strings must be in the "%Y-%m-%d" format.
+        days (int): Number of days.
+    """
+    return _cached_np_dates(np.datetime64(start_date, 'D'), int(max(days, 0)))
+
+
+def get_date_strings(start_date, days: int) -> list:
+    """
+    Returns a list of consecutive daily date strings in the format "%Y-%m-%d".
+    The strings are formatted in bulk and cached by (start_date, days).
+
+    Args:
+        start_date (datetime | np.datetime64 | str): First date. Strings must be in the "%Y-%m-%d" format.
+        days (int): Number of days.
+    """
+    return list(_cached_date_strings(np.datetime64(start_date, 'D'), int(max(days, 0))))
+
+
+class DateCalendar:
+    """
+    Integer calendar arrays for a set of daily dates, computed once in a few
+    vectorized passes. Use get_calendar(dates) to obtain one; calendars for a
+    pd.Index are cached for the life of the index, so all annual and monthly
+    groupings on the same dataframe reuse the same arrays.
+
+    Attributes:
+        dates (np.ndarray): Dates as np.datetime64[D].
+        year (np.ndarray): Calendar year.
+        month (np.ndarray): Month (1-12).
+        day (np.ndarray): Day of the month (1-31).
+        day_of_year (np.ndarray): Day of the calendar year (1-366).
+    """
+
+    def __init__(self, np_dates: np.ndarray) -> None:
+        np_months = np_dates.astype('datetime64[M]')
+        np_years = np_dates.astype('datetime64[Y]')
+        self.dates = np_dates
+        self.year = np_years.astype(np.int64) + 1970
+        self.month = np_months.astype(np.int64) % 12 + 1
+        self.day = (np_dates - np_months).astype(np.int64) + 1
+        self.day_of_year = (np_dates - np_years).astype(np.int64) + 1
+        for v in [self.year, self.month, self.day, self.day_of_year]:
+            v.flags.writeable = False
+        self._wy = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def wy(self, wy_month=7, using_end_year=False) -> np.ndarray:
+        """Returns water years as a (read-only) array of ints. See get_wy(...)."""
+        key = (wy_month, using_end_year)
+        if key not in self._wy:
+            answer = self.year - (self.month < wy_month)
+            if using_end_year:
+                answer = answer + 1
+            answer.flags.writeable = False
+            self._wy[key] = answer
+        return self._wy[key]
+
+
+# Calendars of pd.Index objects, keyed by id(index). Indexes are immutable, so a
+# calendar stays valid until the index is garbage collected (the weakref
+# callback then removes the entry).
+_calendar_cache: dict[int, tuple[weakref.ref, DateCalendar]] = {}
+
+
+def get_calendar(dates) -> DateCalendar:
+    """
+    Returns the DateCalendar for an array of dates (strings in the "%Y-%m-%d"
+    format, or datetimes). If dates is a pd.Index (e.g. df.index) the calendar
+    is cached, and subsequent calls with the same index return it immediately.
+    """
+    key = id(dates)
+    cached = _calendar_cache.get(key)
+    if cached is not None and cached[0]() is dates:
+        return cached[1]
+    if len(dates) == 0:
+        np_dates = np.array([], dtype='datetime64[D]')
+    elif isinstance(dates[0], str):
+        np_dates = to_np_datetimes64d(dates)
+    else:
+        #assume dates are datetime
+        np_dates = dates_to_np_datetimes64d(dates)
+    calendar = DateCalendar(np_dates)
+    if isinstance(dates, pd.Index):
+        _calendar_cache[key] = (weakref.ref(dates, lambda _: _calendar_cache.pop(key, None)), calendar)
+    return calendar
+
+
 def get_wy(dates, wy_month=7, using_end_year=False):
     """
-    Returns water years, as a list of ints, for a given array of dates. Use this to
+    Returns water years, as an array of ints, for a given array of dates. Use this to
     add water year info into a pandas DataFrame. 
 
     The default (using_end_year=False) aligns water years with the primary water 
@@ -54,20 +181,7 @@ def get_wy(dates, wy_month=7, using_end_year=False):
     based on their end dates. Using the fiscal convention, the 2022 water year is 
     from 2021-07-01 to 2022-06-30 inclusive.
     """
-    # Check if the first values is a string
-    if isinstance(dates[0], str):
-        np_dates = to_np_datetimes64d(dates)
-    else:
-        #assume dates are datetime
-        np_dates = np.array(dates, dtype='datetime64[D]')
-    #d.astype('datetime64[Y]').astype(int) + 1970     #<---- this gives the year
-    #d.astype('datetime64[M]').astype(int) % 12 + 1   #<---- this gives the month
-    # TODO: the below implementation was originally written for pd.Timestamp, not np.datetime64d. It may be possible to simplify it.
-    if using_end_year:
-        answer = [(d.astype('datetime64[Y]').astype(int) + 1970) if (d.astype('datetime64[M]').astype(int) % 12 + 1) < wy_month else (d.astype('datetime64[Y]').astype(int) + 1970) + 1 for d in np_dates]
-    else:
-        answer = [(d.astype('datetime64[Y]').astype(int) + 1970) - 1 if (d.astype('datetime64[M]').astype(int) % 12 + 1) < wy_month else (d.astype('datetime64[Y]').astype(int) + 1970) for d in np_dates]        
-    return answer
+    return get_calendar(dates).wy(wy_month, using_end_year)
 
 
 def get_prev_month_end(stringdate):
@@ -148,17 +262,16 @@ def get_year_and_month(v):
         year_month = [x[:7] for x in v]
     else:
         #assume dates are datetime
-        year_month = [d.strftime(r"%Y-%m") for d in v]
+        np_months = dates_to_np_datetimes64d(v).astype('datetime64[M]')
+        year_month = np.datetime_as_string(np_months, unit='M').tolist()
     return year_month
     
 
 def get_month(dates):
     """
-    Returns month, as a list of ints, for a given array of dates.
+    Returns month, as an array of ints, for a given array of dates.
     """
-    np_dates = to_np_datetimes64d(dates)
-    answer = [(d.astype('datetime64[M]').astype(int) % 12 + 1) for d in np_dates]
-    return answer
+    return get_calendar(dates).month
 
 
 def get_dates(start_date: datetime | str, end_date=None, days=0, years=1, include_end_date=False, str_format=None):
@@ -188,7 +301,14 @@ def get_dates(start_date: datetime | str, end_date=None, days=0, years=1, includ
             start_date.hour, start_date.minute, start_date.second, start_date.microsecond)
         days = (end_date - start_date).days
     # Generate the list of dates
-    date_list = [start_date + timedelta(days=x) for x in range(days)]
+    if (type(start_date) is not datetime) or (start_date.tzinfo is not None):
+        # e.g. pd.Timestamp or timezone-aware datetimes; keep their type
+        date_list = [start_date + timedelta(days=x) for x in range(days)]
+    elif (str_format == r"%Y-%m-%d") and (start_date == datetime(start_date.year, start_date.month, start_date.day)):
+        # Fast path for the bulum standard string format
+        return get_date_strings(start_date, days)
+    else:
+        date_list = (np.datetime64(start_date, 'us') + np.arange(days) * np.timedelta64(1, 'D')).tolist()
     # Convert to string format if required
     if (str_format != None):
         date_list = [d.strftime(str_format) for d in date_list]
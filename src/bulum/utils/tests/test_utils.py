@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 import pandas as pd
 from bulum import utils
 import bulum.io as bio
@@ -37,6 +38,20 @@ class Tests(unittest.TestCase):
         violations = utils.check_df_format_standards(df)        
         self.assertEqual(violations, [f"Column 'col_1' is not int64 or float64: object"])
 
+    def test_meets_ts_standards_non_sequential(self):
+        dates = utils.get_dates('2000-01-01', days=1000)
+        df = pd.DataFrame({"y1": 1.0}, index=pd.Index(dates, name="Date"))
+        self.assertEqual(utils.check_df_format_standards(df), [])
+        self.assertEqual(utils.check_df_format_standards(df), [])  # second check is served from the cache
+        dates[500] = '2001-05-15T00'
+        df = pd.DataFrame({"y1": 1.0}, index=pd.Index(dates, name="Date"))
+        self.assertEqual(utils.check_df_format_standards(df),
+                         ["Expected date string '2001-05-15' but found '2001-05-15T00' at index 500"])
+        del dates[500]
+        df = pd.DataFrame({"y1": 1.0}, index=pd.Index(dates, name="Date"))
+        self.assertEqual(utils.check_df_format_standards(df),
+                         ["Expected date string '2001-05-15' but found '2001-05-16' at index 500"])
+
     def test_generate_dates(self):
         dates = utils.get_dates(datetime(2000,1,1), datetime(2020,1,4))
         n = 7308
@@ -51,6 +66,16 @@ class Tests(unittest.TestCase):
         self.assertEqual(date_strings[0],'2000-01-01')
         self.assertEqual(date_strings[n-1],'2020-01-03')
 
+    def test_generate_date_strings_vectorized(self):
+        date_strings = utils.get_date_strings(datetime(1889,1,1), 50000)
+        self.assertEqual(len(date_strings), 50000)
+        self.assertEqual(date_strings[0], '1889-01-01')
+        self.assertEqual(date_strings[-1], '2025-11-23')
+        self.assertListEqual(date_strings, utils.get_dates('1889-01-01', days=50000))
+        np_dates = utils.get_np_dates('1889-01-01', 50000)
+        self.assertListEqual(utils.datetimes_to_strings(np_dates), date_strings)
+        self.assertListEqual(utils.standardize_datestring_format(utils.get_dates('01/01/1889', days=50000)), date_strings)
+
     def test_wy(self):
         dates = utils.get_dates(datetime(2000,1,1), datetime(2020,1,4), str_format=r"%Y-%m-%d")
         wy = utils.get_wy(dates)                #default conventions are wy_month=7 and using_end_year=False
@@ -62,6 +87,45 @@ class Tests(unittest.TestCase):
         wy = utils.get_wy(dates, wy_month=1, using_end_year=True)
         self.assertEqual(wy[len(wy) - 1], 2021) #with the above custom wy_month=1, and the fiscal conventions (using_end_year=True), the WY on the last date should be 2021
 
+    def test_calendar(self):
+        df = bio.read_ts_csv("./src/bulum/stats/tests/test_div_data.csv", r"%Y-%m-%d")
+        calendar = df.calendar
+        self.assertIs(calendar, utils.get_calendar(df.index))  # cached for the life of the index
+        self.assertIs(calendar.wy(7), utils.get_wy(df.index, 7))
+        self.assertEqual(len(calendar), len(df))
+        self.assertEqual(f"{calendar.year[0]:04d}-{calendar.month[0]:02d}-{calendar.day[0]:02d}", df.index[0])
+        self.assertEqual(calendar.day_of_year[0], datetime.strptime(df.index[0], r"%Y-%m-%d").timetuple().tm_yday)
+        self.assertListEqual(list(utils.get_wy(df.index, 1, using_end_year=True)), list(calendar.year + 1))
+
+    def test_ensemble_columnar_store(self):
+        ensemble = utils.DataframeEnsemble()
+        for scen in ["scen1", "scen2"]:
+            for repl in ["repl1", "repl2"]:
+                df = bio.read(f"./src/bulum/stats/tests/scenario_replicates/test_{scen}_{repl}.csv")
+                ensemble.add_dataframe(df, tag=scen)
+        store = ensemble.to_array()
+        self.assertEqual(store.shape, (4, len(ensemble.index), len(ensemble.columns)))
+        matrix = ensemble.variable_matrix("Storage")
+        self.assertEqual(matrix.shape, (len(ensemble.index), 4))
+        self.assertTrue(np.shares_memory(matrix, store))  # zero-copy views of one store
+        self.assertFalse(matrix.flags.writeable)
+        self.assertListEqual(list(matrix[:, 2]), list(ensemble.get(2)["Storage"]))
+        self.assertListEqual(list(ensemble.tag_mask("scen2")), [False, False, True, True])
+        subensemble = ensemble.filter_tag("scen2")
+        self.assertEqual(len(subensemble), 2)
+        self.assertTrue(np.shares_memory(subensemble.variable_matrix("Storage"), store))
+        self.assertListEqual(list(subensemble.variable_matrix("Storage")[:, 0]), list(ensemble.get(2)["Storage"]))
+        # In-place edits to a member write through to the store
+        ensemble.get(2).iloc[0, 0] = -1.0
+        self.assertEqual(matrix[0, 2], -1.0)
+        # Replacing a column detaches the member, and the store is rebuilt
+        ensemble.get(0)["Storage"] = 0.0
+        self.assertTrue((ensemble.variable_matrix("Storage")[:, 0] == 0).all())
+        self.assertTrue((subensemble.variable_matrix("Storage")[:, 0] == ensemble.get(2)["Storage"]).all())
+        ensemble.add_dataframe(ensemble.get(0).copy())
+        self.assertEqual(ensemble.to_array().shape[0], 5)
+        self.assertEqual(ensemble.get(0).tags, "scen1")
+
     def test_set_index_dt(self):
         df = pd.DataFrame()
         df["Date"] = utils.get_dates(datetime(2000,1,1), datetime(2000,1,8))